@@ -3,9 +3,11 @@
 from aiogram import Bot, Dispatcher
 from aiogram.client.default import DefaultBotProperties
 from aiogram.enums import ParseMode
+from fastapi import HTTPException
 
 from config import Config
 from bot.handlers import operator, user
+from bot.middlewares import setup_middlewares
 
 
 bot = Bot(
@@ -14,5 +16,19 @@ bot = Bot(
 )
 
 dp = Dispatcher()
+setup_middlewares(dp, bot)
 dp.include_router(user.router)
 dp.include_router(operator.router)
+
+
+def check_metrics_auth(authorization: str | None) -> None:
+    """Require METRICS_TOKEN as a bearer token; without one, /metrics is off.
+
+    Serverless URLs are public, so unlike the loopback exporter of polling
+    mode they never serve metrics unauthenticated.
+    """
+    token = Config.METRICS_TOKEN
+    if not token:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    if authorization != f"Bearer {token}":
+        raise HTTPException(status_code=401, detail="Unauthorized")
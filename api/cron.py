@@ -1,17 +1,55 @@
 """Vercel cron endpoints for scheduled bot jobs."""
 
+import logging
 import os
+from typing import Awaitable, Callable
 
 from fastapi import FastAPI, Header, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 
-from api._app import bot
-from bot.utils.scheduler import initialize_tasks, send_random_task, send_week_results
+from api._app import bot, check_metrics_auth
+from config import Config
+from bot.utils.delivery import deliver
+from bot.utils.metrics import CONTENT_TYPE, collect
+from bot.utils.scheduler import (
+    initialize_tasks,
+    rollover_week_once,
+    send_task_once,
+    send_week_results_once,
+)
 
 
+logger = logging.getLogger(__name__)
+
 app = FastAPI()
 
 
+def _chat_ids(chat_id: int | None) -> list[int]:
+    """The requested chat, or every configured chat."""
+    if chat_id is None:
+        return list(Config.CHATS)
+    if chat_id not in Config.CHATS:
+        raise HTTPException(status_code=404, detail="Unknown chat")
+    return [chat_id]
+
+
+async def _run_per_chat(chat_ids: list[int],
+                        run: Callable[[int], Awaitable[bool]]) -> tuple[list[int], list[int]]:
+    """Run a job for each chat; one chat failing does not stop the others.
+
+    Returns the chats it ran for and the chats it failed for.
+    """
+    ran, failed = [], []
+    for chat_id in chat_ids:
+        try:
+            if await run(chat_id):
+                ran.append(chat_id)
+        except Exception as e:
+            logger.error("Cron job failed for chat %s: %s", chat_id, e)
+            failed.append(chat_id)
+    return ran, failed
+
+
 def _check_cron_auth(authorization: str | None) -> None:
     secret = os.getenv("CRON_SECRET")
     if not secret:
@@ -21,15 +59,51 @@ def _check_cron_auth(authorization: str | None) -> None:
 
 
 @app.get("/send-task")
-async def cron_send_task(authorization: str | None = Header(default=None)) -> JSONResponse:
+async def cron_send_task(
+    chat_id: int | None = None,
+    authorization: str | None = Header(default=None),
+) -> JSONResponse:
     _check_cron_auth(authorization)
     initialize_tasks()
-    await send_random_task(bot)
-    return JSONResponse({"ok": True, "job": "send-task"})
+    sent, failed = await _run_per_chat(_chat_ids(chat_id),
+                                       lambda target: send_task_once(bot, target))
+    return JSONResponse(
+        {"ok": not failed, "job": "send-task", "chats": sent, "failed": failed},
+        status_code=500 if failed else 200,
+    )
 
 
 @app.get("/week-end")
-async def cron_week_end(authorization: str | None = Header(default=None)) -> JSONResponse:
+async def cron_week_end(
+    chat_id: int | None = None,
+    authorization: str | None = Header(default=None),
+) -> JSONResponse:
+    _check_cron_auth(authorization)
+    sent, failed = await _run_per_chat(_chat_ids(chat_id),
+                                       lambda target: send_week_results_once(bot, target))
+    delivered = await deliver(bot, budget=Config.DM_CRON_BUDGET_SECONDS)
+    return JSONResponse(
+        {"ok": not failed, "job": "week-end", "chats": sent, "failed": failed,
+         "delivered": delivered},
+        status_code=500 if failed else 200,
+    )
+
+
+@app.get("/deliver")
+async def cron_deliver(authorization: str | None = Header(default=None)) -> JSONResponse:
     _check_cron_auth(authorization)
-    await send_week_results(bot)
-    return JSONResponse({"ok": True, "job": "week-end"})
+    delivered = await deliver(bot, budget=Config.DM_CRON_BUDGET_SECONDS)
+    return JSONResponse({"ok": True, "job": "deliver", "delivered": delivered})
+
+
+@app.get("/week-rollover")
+async def cron_week_rollover(authorization: str | None = Header(default=None)) -> JSONResponse:
+    _check_cron_auth(authorization)
+    ran = await rollover_week_once()
+    return JSONResponse({"ok": True, "job": "week-rollover", "ran": ran})
+
+
+@app.get("/metrics")
+async def metrics(authorization: str | None = Header(default=None)) -> Response:
+    check_metrics_auth(authorization)
+    return Response(await collect(), media_type=CONTENT_TYPE)
@@ -0,0 +1,235 @@
+"""Read-only JSON leaderboard API for web dashboards.
+
+Each response is rendered once into a snapshot: the JSON body, its gzip
+encoding and an ETag for each. Snapshots are cached until the chat's
+scores change in this process or LEADERBOARD_API_TTL seconds pass (scores
+are written by other processes too), so polling clients are answered from
+memory, with 304 Not Modified while their If-None-Match still matches.
+
+GET /stream pushes score changes as server-sent events instead (see
+bot.utils.score_feed).
+"""
+
+import asyncio
+import gzip
+import hashlib
+import json
+import time
+from datetime import datetime
+from typing import Any, AsyncIterator, List, Optional
+
+from fastapi import FastAPI, Header, HTTPException
+from fastapi.responses import Response, StreamingResponse
+
+from config import Config
+from database import Database
+from bot.utils.cache import VersionedCache
+from bot.utils.score_feed import ScoreFeed, Subscriber, format_event
+
+
+app = FastAPI()
+db = Database()
+# Snapshots are dropped every LEADERBOARD_API_TTL seconds, so they never
+# outnumber the distinct requests (weeks, limits, users) within that time
+snapshots = VersionedCache()
+user_snapshots = VersionedCache()
+_snapshots_bucket = 0
+feed = ScoreFeed(db, Config.SSE_FRAME_SECONDS, Config.SSE_BUFFER_FRAMES, Config.SSE_LAG_SECONDS)
+
+MAX_LIMIT = 100
+
+
+class Snapshot:
+    """A rendered response body with its gzip encoding and their ETags.
+
+    The encodings are different bytes, so they get different (strong) ETags.
+    """
+
+    __slots__ = ("body", "gzipped", "etag", "gzip_etag")
+
+    def __init__(self, payload: Any):
+        self.body = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode()
+        self.gzipped = gzip.compress(self.body, mtime=0)
+        digest = hashlib.sha256(self.body).hexdigest()[:32]
+        self.etag = f'"{digest}"'
+        self.gzip_etag = f'"{digest}-gz"'
+
+
+def _bucket() -> int:
+    return int(time.time() // Config.LEADERBOARD_API_TTL)
+
+
+def _drop_stale_snapshots() -> None:
+    """Empty the snapshot caches when a new TTL bucket starts."""
+    global _snapshots_bucket
+    bucket = _bucket()
+    if bucket != _snapshots_bucket:
+        snapshots.invalidate()
+        user_snapshots.invalidate()
+        _snapshots_bucket = bucket
+
+
+def _version(chat_id: int) -> int:
+    # Both terms only grow, so their sum changes whenever either does
+    return db.get_score_version(chat_id) + _bucket()
+
+
+def _week(week: Optional[int], year: Optional[int]) -> tuple[int, int]:
+    """The requested week, or the current one."""
+    if week is None and year is None:
+        now = datetime.now()
+        return now.isocalendar()[1], now.year
+    if week is None or year is None:
+        raise HTTPException(status_code=400, detail="week and year go together")
+    if not 1 <= week <= 53:
+        raise HTTPException(status_code=400, detail="week must be 1-53")
+    return week, year
+
+
+def _check_chat(chat_id: Optional[int]) -> int:
+    chat_id = chat_id or Config.CHAT_ID
+    if chat_id not in Config.CHATS:
+        raise HTTPException(status_code=404, detail="Unknown chat")
+    return chat_id
+
+
+def _respond(snapshot: Snapshot, if_none_match: Optional[str],
+             accept_encoding: Optional[str]) -> Response:
+    gzipped = bool(accept_encoding and "gzip" in accept_encoding)
+    etag = snapshot.gzip_etag if gzipped else snapshot.etag
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={int(Config.LEADERBOARD_API_TTL)}",
+        "Vary": "Accept-Encoding",
+    }
+    if if_none_match and etag in {tag.strip() for tag in if_none_match.split(",")}:
+        return Response(status_code=304, headers=headers)
+    if gzipped:
+        headers["Content-Encoding"] = "gzip"
+        return Response(snapshot.gzipped, media_type="application/json", headers=headers)
+    return Response(snapshot.body, media_type="application/json", headers=headers)
+
+
+def _ranked(users: list) -> list:
+    """Leaderboard rows with ranks; equal points share a rank."""
+    rows = []
+    for position, user in enumerate(users, 1):
+        rank = rows[-1]["rank"] if rows and rows[-1]["total_points"] == user["total_points"] else position
+        rows.append({
+            "rank": rank,
+            "user_id": user["user_id"],
+            "username": user["username"],
+            "first_name": user["first_name"],
+            "total_points": user["total_points"],
+        })
+    return rows
+
+
+@app.get("/")
+async def leaderboard(
+    chat_id: Optional[int] = None,
+    week: Optional[int] = None,
+    year: Optional[int] = None,
+    limit: int = 10,
+    if_none_match: Optional[str] = Header(default=None),
+    accept_encoding: Optional[str] = Header(default=None),
+) -> Response:
+    chat_id = _check_chat(chat_id)
+    week, year = _week(week, year)
+    limit = max(1, min(limit, MAX_LIMIT))
+    _drop_stale_snapshots()
+
+    async def load() -> Snapshot:
+        users = await asyncio.to_thread(db.get_leaderboard, chat_id, week, year, limit=limit)
+        return Snapshot({
+            "chat_id": chat_id,
+            "week": week,
+            "year": year,
+            "users": _ranked(users),
+        })
+
+    snapshot = await snapshots.get(("top", chat_id, week, year, limit), _version(chat_id), load)
+    return _respond(snapshot, if_none_match, accept_encoding)
+
+
+@app.get("/users/{user_id}")
+async def user_rank(
+    user_id: int,
+    chat_id: Optional[int] = None,
+    week: Optional[int] = None,
+    year: Optional[int] = None,
+    if_none_match: Optional[str] = Header(default=None),
+    accept_encoding: Optional[str] = Header(default=None),
+) -> Response:
+    chat_id = _check_chat(chat_id)
+    week, year = _week(week, year)
+    _drop_stale_snapshots()
+
+    async def load() -> Optional[Snapshot]:
+        user = await asyncio.to_thread(db.get_user_rank, chat_id, user_id, week, year)
+        if user is None:
+            return None
+        return Snapshot({
+            "chat_id": chat_id,
+            "week": week,
+            "year": year,
+            "user_id": user["user_id"],
+            "username": user["username"],
+            "first_name": user["first_name"],
+            "total_points": user["total_points"],
+            "rank": user["rank"],
+        })
+
+    snapshot = await user_snapshots.get((chat_id, user_id, week, year), _version(chat_id), load)
+    if snapshot is None:
+        raise HTTPException(status_code=404, detail="Unknown user")
+    return _respond(snapshot, if_none_match, accept_encoding)
+
+
+async def _events(subscriber: Subscriber, backlog: Optional[List[bytes]]) -> AsyncIterator[bytes]:
+    try:
+        yield b"retry: 3000\n\n"
+        for frame in backlog or ():
+            yield frame
+        # Sets the client's Last-Event-ID even before the first change;
+        # "reset" asks a client too far behind to reload the leaderboard
+        yield format_event("ready" if backlog is not None else "reset",
+                           {"chat_id": subscriber.chat_id}, subscriber.since)
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + Config.SSE_STREAM_SECONDS if Config.SSE_STREAM_SECONDS > 0 else None
+        while not (subscriber.dropped and subscriber.queue.empty()):
+            timeout = Config.SSE_KEEPALIVE_SECONDS
+            if deadline is not None:
+                timeout = min(timeout, deadline - loop.time())
+                if timeout <= 0:
+                    break
+            try:
+                frame = await asyncio.wait_for(subscriber.queue.get(), timeout)
+            except asyncio.TimeoutError:
+                yield b": keepalive\n\n"
+                continue
+            yield frame
+    finally:
+        feed.unsubscribe(subscriber)
+
+
+@app.get("/stream")
+async def stream(
+    chat_id: Optional[int] = None,
+    last_event_id: Optional[str] = Header(default=None),
+) -> StreamingResponse:
+    chat_id = _check_chat(chat_id)
+    subscriber = await feed.subscribe(chat_id)
+    backlog: Optional[List[bytes]] = []
+    try:
+        if last_event_id and last_event_id.isdigit():
+            backlog = await feed.catch_up(chat_id, int(last_event_id), subscriber.since)
+    except Exception:
+        feed.unsubscribe(subscriber)
+        raise
+    return StreamingResponse(
+        _events(subscriber, backlog),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,15 +1,22 @@
 """Telegram webhook endpoint for Vercel."""
 
+import asyncio
 import os
+import time
 
 from aiogram.types import Update
 from fastapi import FastAPI, Header, HTTPException, Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, Response
 
-from api._app import bot, dp
+from api._app import bot, check_metrics_auth, dp
+from config import Config
+from bot.utils import profiler
+from bot.utils.metrics import CONTENT_TYPE, collect
+from bot.utils.recorder import create_recorder
 
 
 app = FastAPI()
+recorder = create_recorder()
 
 
 @app.get("/")
@@ -17,6 +24,44 @@ async def healthcheck() -> dict:
     return {"ok": True}
 
 
+@app.get("/metrics")
+async def metrics(authorization: str | None = Header(default=None)) -> Response:
+    check_metrics_auth(authorization)
+    return Response(await collect(), media_type=CONTENT_TYPE)
+
+
+@app.get("/profile")
+async def profile(
+    seconds: float = 5,
+    mode: str = "busy",
+    format: str = "json",
+    authorization: str | None = Header(default=None),
+) -> Response:
+    token = Config.PROFILE_TOKEN
+    if not token:
+        raise HTTPException(status_code=404, detail="Profiling is disabled")
+    if authorization != f"Bearer {token}":
+        raise HTTPException(status_code=401, detail="Unauthorized")
+
+    try:
+        result = await profiler.profile(seconds, mode)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except profiler.ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+    if format == "collapsed":
+        return PlainTextResponse(result.collapsed())
+    return JSONResponse({
+        "mode": result.mode,
+        "seconds": result.seconds,
+        "samples": result.samples,
+        "idle_samples": result.idle,
+        "top": result.top_functions(),
+        "file": result.write(Config.PROFILE_DIR),
+    })
+
+
 @app.post("/")
 async def telegram_webhook(
     request: Request,
@@ -26,7 +71,11 @@ async def telegram_webhook(
     if secret and x_telegram_bot_api_secret_token != secret:
         raise HTTPException(status_code=403, detail="Invalid webhook secret")
 
+    received_at = time.time()
     data = await request.json()
     update = Update.model_validate(data, context={"bot": bot})
     await dp.feed_update(bot, update)
+    if recorder:
+        # Written before responding: the instance may be frozen right after
+        await asyncio.to_thread(recorder.write, [data], received_at)
     return JSONResponse({"ok": True})
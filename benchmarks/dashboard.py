@@ -0,0 +1,62 @@
+"""Benchmark get_user_dashboard against the old multi-query /my_points path.
+
+Run with: python -m benchmarks.dashboard [--users N] [--points N] [--runs N]
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from benchmarks.fixtures import BENCH_CHAT_ID, seed_database
+from database import Database
+
+
+def old_path(db: Database, user_id: int) -> None:
+    """Replicate the query sequence of the previous send_my_points."""
+    if db.is_user_banned(user_id):
+        return
+    if not db.get_user(user_id):
+        db.add_user(user_id=user_id)
+    db.get_user_points(BENCH_CHAT_ID, user_id)
+    db.get_user(user_id)
+    db.get_daily_activity_points(BENCH_CHAT_ID, user_id)
+
+
+def new_path(db: Database, user_id: int) -> None:
+    """Single-transaction dashboard read."""
+    db.get_user_dashboard(BENCH_CHAT_ID, user_id)
+
+
+def measure(func, db: Database, user_ids) -> float:
+    """Return mean milliseconds per call."""
+    start = time.perf_counter()
+    for user_id in user_ids:
+        func(db, user_id)
+    return (time.perf_counter() - start) * 1000 / len(user_ids)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--points", type=int, default=200000)
+    parser.add_argument("--runs", type=int, default=500)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, "bench.db"))
+        seed_database(db, args.users, args.points)
+        user_ids = [random.randint(1, args.users) for _ in range(args.runs)]
+
+        old_ms = measure(old_path, db, user_ids)
+        new_ms = measure(new_path, db, user_ids)
+
+    print(f"users={args.users} points={args.points} runs={args.runs}")
+    print(f"old send_my_points path: {old_ms:.3f} ms/call")
+    print(f"get_user_dashboard:      {new_ms:.3f} ms/call")
+    print(f"speedup:                 {old_ms / new_ms:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
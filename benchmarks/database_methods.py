@@ -0,0 +1,223 @@
+"""Micro-benchmarks for every public Database method at production volumes.
+
+The database is generated in bulk (default 50k users, 5M points rows and
+1M answers), then each method is timed and the query plans of the
+statements it ran are captured with EXPLAIN QUERY PLAN.
+
+Run with:
+    python -m benchmarks.database_methods
+    python -m benchmarks.database_methods --db /tmp/bench.db --reuse --only get_leaderboard
+"""
+
+import argparse
+import json
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Tuple
+
+from benchmarks.fixtures import BENCH_CHAT_ID, BENCH_OPERATOR_ID, bulk_seed
+from database import Database
+from benchmarks.stats import summarize
+
+PLAN_PREFIXES = ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH", "REPLACE")
+
+
+class TracedDatabase(Database):
+    """Database that can record the SQL its methods execute."""
+
+    def __init__(self, db_path: str):
+        self.statements: List[str] = []
+        self.tracing = False
+        super().__init__(db_path)
+
+    @contextmanager
+    def get_connection(self):
+        with super().get_connection() as conn:
+            if self.tracing:
+                conn.set_trace_callback(self.statements.append)
+            yield conn
+
+
+def explain(db_path: str, statements: List[str]) -> List[Dict[str, Any]]:
+    """EXPLAIN QUERY PLAN each distinct data statement."""
+    plans = []
+    seen = set()
+    conn = sqlite3.connect(db_path)
+    try:
+        for sql in statements:
+            text = " ".join(sql.split())
+            if not text.upper().startswith(PLAN_PREFIXES) or text in seen:
+                continue
+            seen.add(text)
+            try:
+                rows = conn.execute(f"EXPLAIN QUERY PLAN {text}").fetchall()
+                plan = [row[3] for row in rows]
+            except sqlite3.Error as e:
+                plan = [f"error: {e}"]
+            plans.append({"sql": text, "plan": plan})
+    finally:
+        conn.close()
+    return plans
+
+
+def build_cases(users: int, rng: random.Random) -> List[Tuple[str, int, Callable]]:
+    """(method name, repetitions, callable taking db) for each public method."""
+    now = datetime.now()
+    week_number = now.isocalendar()[1]
+    year = now.year
+
+    def uid() -> int:
+        return rng.randint(1, users)
+
+    def first_pending(db: Database) -> int:
+        with db.get_connection() as conn:
+            row = conn.execute(
+                "SELECT answer_id FROM answers WHERE status = 'pending' LIMIT 1"
+            ).fetchone()
+            return row[0] if row else 1
+
+    return [
+        ("get_user", 2000, lambda db: db.get_user(uid())),
+        ("is_user_banned", 2000, lambda db: db.is_user_banned(uid())),
+        ("get_user_id_by_username", 2000, lambda db: db.get_user_id_by_username(f"USER{uid()}")),
+        ("get_user_ids_by_usernames", 200,
+         lambda db: db.get_user_ids_by_usernames([f"user{uid()}" for _ in range(20)])),
+        ("sync_user (unchanged)", 1000,
+         lambda db: db.sync_user(7, "user7", "User 7")),
+        ("add_user", 500, lambda db: db.add_user(users + rng.randint(1, 1000), "new", "New")),
+        ("get_user_dashboard", 1000, lambda db: db.get_user_dashboard(BENCH_CHAT_ID, uid())),
+        ("get_active_tasks", 500, lambda db: db.get_active_tasks()),
+        ("get_current_daily_task", 1000, lambda db: db.get_current_daily_task(BENCH_CHAT_ID)),
+        ("submit_answer", 500,
+         lambda db: db.submit_answer(uid(), db.get_current_daily_task(BENCH_CHAT_ID)["id"], 1,
+                                     "text", "bench", fingerprint=f"text:bench:{rng.random()}")),
+        ("get_answer", 2000, lambda db: db.get_answer(rng.randint(1, 1000))),
+        ("update_answer_status", 500,
+         lambda db: db.update_answer_status(first_pending(db), "approved", BENCH_OPERATOR_ID)),
+        ("add_points", 1000, lambda db: db.add_points(BENCH_CHAT_ID, uid(), 5, "bench")),
+        ("get_user_points", 1000, lambda db: db.get_user_points(BENCH_CHAT_ID, uid())),
+        ("get_leaderboard", 20, lambda db: db.get_leaderboard(BENCH_CHAT_ID, limit=10)),
+        ("get_leaderboard (past week)", 20,
+         lambda db: db.get_leaderboard(BENCH_CHAT_ID, week_number=max(1, week_number - 1), year=year)),
+        ("update_chat_activity", 1000, lambda db: db.update_chat_activity(BENCH_CHAT_ID, uid(), 10, 10)),
+        ("get_daily_activity_points", 2000, lambda db: db.get_daily_activity_points(BENCH_CHAT_ID, uid())),
+        ("add_warning", 300, lambda db: db.add_warning(uid(), BENCH_OPERATOR_ID, "bench")),
+        ("add_warnings (50 users)", 20,
+         lambda db: db.add_warnings([uid() for _ in range(50)], BENCH_OPERATOR_ID, "bench")),
+        ("set_banned (50 users)", 20,
+         lambda db: db.set_banned([uid() for _ in range(50)], False)),
+        ("get_user_warnings", 1000, lambda db: db.get_user_warnings(uid())),
+        ("get_all_users_stats", 5, lambda db: db.get_all_users_stats(BENCH_CHAT_ID)),
+        ("get_week_summaries", 3, lambda db: db.get_week_summaries(BENCH_CHAT_ID, week_number, year)),
+        ("search_answers (rare word)", 200, lambda db: db.search_answers(str(uid()), limit=6)),
+        ("search_answers (phrase)", 200,
+         lambda db: db.search_answers(f'"number {uid()} about"', limit=6)),
+        ("search_answers (next page)", 200,
+         lambda db: db.search_answers(str(uid() % 100), limit=6, offset=6)),
+        ("search_answers (common word)", 3, lambda db: db.search_answers("answer", limit=6)),
+        ("add_task", 100, lambda db: db.add_task("Bench task", "text", 100)),
+        ("add_daily_task", 100, lambda db: db.add_daily_task(BENCH_CHAT_ID, 1, week_number, year)),
+        ("reset_weekly_moderation", 3,
+         lambda db: db.reset_weekly_moderation(week_number, year)),
+        ("rebuild_weekly_scores", 1, lambda db: db.rebuild_weekly_scores()),
+    ]
+
+
+def run_case(db: TracedDatabase, name: str, repetitions: int,
+             func: Callable) -> Dict[str, Any]:
+    """Time one method and capture the plans of its statements."""
+    db.statements.clear()
+    db.tracing = True
+    func(db)
+    db.tracing = False
+    plans = explain(db.db_path, db.statements)
+
+    timings = []
+    for _ in range(repetitions):
+        start = time.perf_counter()
+        func(db)
+        timings.append(time.perf_counter() - start)
+
+    result = {"method": name, **summarize(timings), "plans": plans}
+    result["full_scan"] = any(
+        line.startswith("SCAN") and " USING " not in line and "CONSTANT ROW" not in line
+        # FTS5 reads its one-row config table on every write and search
+        and not line.endswith("_fts_config")
+        for entry in plans for line in entry["plan"]
+    )
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Database method benchmarks")
+    parser.add_argument("--users", type=int, default=50000)
+    parser.add_argument("--points", type=int, default=5000000)
+    parser.add_argument("--answers", type=int, default=1000000)
+    parser.add_argument("--weeks", type=int, default=10)
+    parser.add_argument("--chats", type=int, default=1,
+                        help="spread points over N chats; methods query the first")
+    parser.add_argument("--db", default=None, help="database file (default: temporary)")
+    parser.add_argument("--reuse", action="store_true",
+                        help="skip seeding if --db already exists")
+    parser.add_argument("--only", default=None,
+                        help="comma-separated substrings of method names to run")
+    parser.add_argument("--scale", type=float, default=1.0,
+                        help="multiply repetition counts")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None,
+                        help="JSON result path (default benchmarks/results/database-<time>.json)")
+    args = parser.parse_args()
+
+    tmp = None
+    db_path = args.db
+    if db_path is None:
+        tmp = tempfile.TemporaryDirectory()
+        db_path = os.path.join(tmp.name, "bench.db")
+
+    reuse = args.reuse and os.path.exists(db_path)
+    db = TracedDatabase(db_path)
+    if not reuse:
+        started = time.perf_counter()
+        bulk_seed(db, args.users, args.points, args.answers, weeks=args.weeks,
+                  chats=args.chats)
+        print(f"Seeded {args.users} users, {args.points} points, {args.answers} answers "
+              f"in {time.perf_counter() - started:.1f}s")
+
+    rng = random.Random(args.seed)
+    only = [part.strip() for part in args.only.split(",")] if args.only else None
+    results = []
+    print(f"\n{'method':<32} {'runs':>6} {'mean ms':>9} {'p50 ms':>9} {'p95 ms':>9}  plan")
+    for name, repetitions, func in build_cases(args.users, rng):
+        if only and not any(part in name for part in only):
+            continue
+        result = run_case(db, name, max(1, int(repetitions * args.scale)), func)
+        results.append(result)
+        flag = "FULL SCAN" if result["full_scan"] else ""
+        print(f"{name:<32} {result['count']:>6} {result['mean_ms']:>9.3f} "
+              f"{result['p50_ms']:>9.3f} {result['p95_ms']:>9.3f}  {flag}")
+
+    output = args.output or os.path.join(
+        "benchmarks", "results",
+        f"database-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json",
+    )
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump({
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "params": vars(args),
+            "sqlite": sqlite3.sqlite_version,
+            "results": results,
+        }, f, ensure_ascii=False, indent=2)
+    print(f"\nResults and query plans written to {output}")
+
+    if tmp:
+        tmp.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""In-process fake of the Telegram Bot API for benchmarks and replays."""
+
+import asyncio
+import time
+from collections import Counter
+from typing import Any, AsyncGenerator, Dict, List, Optional, Tuple
+from aiogram import Bot
+from aiogram.client.default import DefaultBotProperties
+from aiogram.client.session.base import BaseSession
+from aiogram.enums import ParseMode
+from aiogram.methods import TelegramMethod
+from aiogram.types import Message
+
+FAKE_TOKEN = "123456789:AAFakeTokenForBenchmarksOnly_xxxxxxxxxx"
+
+
+class FakeSession(BaseSession):
+    """Bot session that answers every API call locally and records it.
+
+    Methods returning only a Message get a minimal synthetic message back,
+    all other methods get True. An optional fixed delay emulates network time.
+    """
+
+    def __init__(self, latency: float = 0.0):
+        """Initialize session with simulated per-call latency in seconds."""
+        super().__init__()
+        self.latency = latency
+        self.calls: Counter = Counter()
+        self.log: List[Tuple[str, Dict[str, Any]]] = []
+        self.record_payloads = False
+        self._message_id = 0
+
+    async def make_request(self, bot: Bot, method: TelegramMethod,
+                           timeout: Optional[int] = None) -> Any:
+        """Record the call and return a plausible result."""
+        name = method.__api_method__
+        self.calls[name] += 1
+        if self.record_payloads:
+            self.log.append((name, method.model_dump(exclude_none=True)))
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        if method.__returning__ is Message:
+            self._message_id += 1
+            chat_id = getattr(method, "chat_id", 0)
+            is_private = isinstance(chat_id, int) and chat_id > 0
+            return Message.model_validate(
+                {
+                    "message_id": self._message_id,
+                    "date": int(time.time()),
+                    "chat": {"id": chat_id, "type": "private" if is_private else "supergroup"},
+                    "from": {"id": bot.id, "is_bot": True, "first_name": "Bot"},
+                    "text": getattr(method, "text", None),
+                },
+                context={"bot": bot},
+            )
+        return True
+
+    async def stream_content(self, url: str, headers: Optional[Dict[str, Any]] = None,
+                             timeout: int = 30, chunk_size: int = 65536,
+                             raise_for_status: bool = True) -> AsyncGenerator[bytes, None]:
+        """Downloads are not supported by the fake API."""
+        raise NotImplementedError("Downloads are not supported by the fake API")
+        yield b""  # Unreachable, makes this an async generator
+
+    async def close(self) -> None:
+        """Nothing to close."""
+
+    def reset(self) -> None:
+        """Forget recorded calls."""
+        self.calls.clear()
+        self.log.clear()
+
+
+def create_fake_bot(latency: float = 0.0, bot_id: Optional[int] = None) -> Bot:
+    """Create a Bot wired to a FakeSession.
+
+    bot_id overrides the id in the token, e.g. to match recorded updates.
+    """
+    token = FAKE_TOKEN if bot_id is None else f"{bot_id}:{FAKE_TOKEN.split(':', 1)[1]}"
+    return Bot(
+        token=token,
+        session=FakeSession(latency),
+        default=DefaultBotProperties(parse_mode=ParseMode.HTML),
+    )
@@ -0,0 +1,193 @@
+"""Shared setup for benchmarks: environment, data seeding and wiring."""
+
+import os
+import random
+from datetime import datetime, date
+from typing import Any, Dict
+
+BENCH_CHAT_ID = -1001000000000
+BENCH_THREAD_ID = 77
+BENCH_OPERATOR_ID = 900000001
+
+
+def configure_env() -> None:
+    """Provide config values so bot modules import without a real .env.
+
+    Must run before anything imports config.
+    """
+    from benchmarks.fake_api import FAKE_TOKEN
+
+    os.environ.setdefault("BOT_TOKEN", FAKE_TOKEN)
+    os.environ.setdefault("CHAT_ID", str(BENCH_CHAT_ID))
+    os.environ.setdefault("FLOOD_THREAD_ID", str(BENCH_THREAD_ID))
+    os.environ.setdefault("OPERATOR_IDS", str(BENCH_OPERATOR_ID))
+
+
+# database reads Config, which validates itself on import
+configure_env()
+
+from database import Database  # noqa: E402
+
+
+def seed_database(db: Database, users: int, points: int, answers: int = 0,
+                  rng: random.Random = None) -> Dict[str, Any]:
+    """Fill database with users, current-week points, activity and answers.
+
+    Answers are left pending against one current daily task, at most one
+    per user. Returns IDs the benchmark scenarios need.
+    """
+    rng = rng or random.Random(0)
+    answers = min(answers, users)
+    now = datetime.now()
+    week_number = now.isocalendar()[1]
+    year = now.year
+    today = date.today()
+
+    with db.get_connection() as conn:
+        conn.executemany(
+            """
+            INSERT OR IGNORE INTO users (user_id, username, first_name, chat_id)
+            VALUES (?, ?, ?, ?)
+            """,
+            ((uid, f"user{uid}", f"User {uid}", BENCH_CHAT_ID) for uid in range(1, users + 1)),
+        )
+        conn.executemany(
+            """
+            INSERT INTO points (chat_id, user_id, points, reason, week_number, year)
+            VALUES (?, ?, ?, 'chat_activity', ?, ?)
+            """,
+            (
+                (BENCH_CHAT_ID, rng.randint(1, users), rng.randint(1, 20), week_number, year)
+                for _ in range(points)
+            ),
+        )
+        conn.executemany(
+            """
+            INSERT OR IGNORE INTO chat_activity
+            (chat_id, user_id, date, messages_count, words_count, points_earned)
+            VALUES (?, ?, ?, 1, 10, 10)
+            """,
+            ((BENCH_CHAT_ID, uid, today) for uid in range(1, users + 1, 2)),
+        )
+    db.rebuild_weekly_scores()
+
+    task_id = db.add_task("Benchmark task", "photo", 200)
+    daily_task_id = db.add_daily_task(BENCH_CHAT_ID, task_id, week_number, year)
+
+    with db.get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT COALESCE(MAX(answer_id), 0) FROM answers")
+        first_answer_id = cursor.fetchone()[0] + 1
+        cursor.executemany(
+            """
+            INSERT INTO answers
+            (chat_id, user_id, daily_task_id, message_id, content_type, content)
+            VALUES (?, ?, ?, ?, 'text', 'benchmark answer text')
+            """,
+            ((BENCH_CHAT_ID, i % users + 1, daily_task_id, i) for i in range(answers)),
+        )
+
+    return {
+        "daily_task_id": daily_task_id,
+        "pending_answer_ids": list(range(first_answer_id, first_answer_id + answers)),
+    }
+
+
+def use_database(db: Database) -> None:
+    """Point every bot module at db and drop in-memory caches."""
+    from bot.handlers import operator, user
+    from bot.utils import metrics, scheduler, users
+
+    for module in (operator, user, scheduler, users, metrics):
+        module.db = db
+    user.leaderboard_cache.invalidate()
+    users._profiles.clear()
+    users._home_chats.clear()
+
+
+def bulk_seed(db: Database, users: int, points: int, answers: int,
+              weeks: int = 10, activity_days: int = 7, tasks: int = 30,
+              chats: int = 1) -> None:
+    """Generate production-like volumes inside SQLite itself.
+
+    Rows come from recursive CTEs with random(), avoiding a Python round-trip
+    per row, so millions of rows take seconds. Points and daily tasks are
+    spread over the last `weeks` ISO weeks, the latest being the current one.
+    Points are spread over `chats` chats counting down from BENCH_CHAT_ID;
+    everything else belongs to BENCH_CHAT_ID.
+    """
+    now = datetime.now()
+    week_number = now.isocalendar()[1]
+    year = now.year
+
+    with db.get_connection() as conn:
+        conn.execute("PRAGMA synchronous = OFF")
+        cursor = conn.cursor()
+        cursor.execute("""
+            WITH RECURSIVE seq(n) AS (SELECT 1 UNION ALL SELECT n + 1 FROM seq WHERE n < ?)
+            INSERT OR IGNORE INTO users
+            (user_id, username, first_name, warnings_count, is_banned, chat_id)
+            SELECT n, 'user' || n, 'User ' || n,
+                   CASE WHEN n % 97 = 0 THEN 1 ELSE 0 END,
+                   CASE WHEN n % 499 = 0 THEN 1 ELSE 0 END,
+                   ?
+            FROM seq
+        """, (users, BENCH_CHAT_ID))
+        cursor.execute("""
+            WITH RECURSIVE seq(n) AS (SELECT 1 UNION ALL SELECT n + 1 FROM seq WHERE n < ?)
+            INSERT INTO tasks (text, content_type, points)
+            SELECT 'Task ' || n,
+                   CASE n % 3 WHEN 0 THEN 'text' WHEN 1 THEN 'photo' ELSE 'video' END,
+                   CASE n % 3 WHEN 0 THEN 100 WHEN 1 THEN 200 ELSE 300 END
+            FROM seq
+        """, (tasks,))
+        # Two tasks per day; week offset 0 is the current week
+        cursor.execute("""
+            WITH RECURSIVE seq(n) AS (SELECT 0 UNION ALL SELECT n + 1 FROM seq WHERE n < ?)
+            INSERT INTO daily_tasks (chat_id, task_id, week_number, year, sent_at)
+            SELECT ?, (SELECT MIN(task_id) FROM tasks) + n % ?,
+                   MAX(1, ? - (? - 1 - n / 14)), ?,
+                   datetime('now', '-' || ((? * 14 - 1 - n) * 12) || ' hours')
+            FROM seq
+        """, (weeks * 14 - 1, BENCH_CHAT_ID, tasks, week_number, weeks, year, weeks))
+        cursor.execute("""
+            WITH RECURSIVE seq(n) AS (SELECT 1 UNION ALL SELECT n + 1 FROM seq WHERE n < ?)
+            INSERT INTO points (chat_id, user_id, points, reason, reference_id, week_number, year)
+            SELECT ? - abs(random()) % ?, abs(random()) % ? + 1,
+                   abs(random()) % 20 + 1,
+                   'chat_activity',
+                   NULL,
+                   MAX(1, ? - abs(random()) % ?),
+                   ?
+            FROM seq
+        """, (points, BENCH_CHAT_ID, chats, users, week_number, weeks, year))
+        # Answers cycle through users per daily task so pairs stay distinct
+        cursor.execute("""
+            WITH RECURSIVE seq(n) AS (SELECT 0 UNION ALL SELECT n + 1 FROM seq WHERE n < ?)
+            INSERT INTO answers
+            (chat_id, user_id, daily_task_id, message_id, content_type, content, status)
+            SELECT ?, n % ? + 1,
+                   (SELECT MIN(id) FROM daily_tasks) + (n / ?) % (? * 14),
+                   n + 1,
+                   'text',
+                   'Answer text number ' || n || ' about ' || hex(randomblob(8)),
+                   CASE abs(random()) % 10 WHEN 0 THEN 'pending'
+                        WHEN 1 THEN 'rejected' ELSE 'approved' END
+            FROM seq
+        """, (answers - 1, BENCH_CHAT_ID, users, users, weeks))
+        cursor.execute("""
+            WITH RECURSIVE seq(n) AS (SELECT 0 UNION ALL SELECT n + 1 FROM seq WHERE n < ?)
+            INSERT OR IGNORE INTO chat_activity
+            (chat_id, user_id, date, messages_count, words_count, points_earned)
+            SELECT ?, n % ? + 1,
+                   date('now', '-' || (n / ?) || ' days'),
+                   abs(random()) % 50 + 1,
+                   abs(random()) % 500 + 1,
+                   abs(random()) % 200
+            FROM seq
+        """, (users * activity_days - 1, BENCH_CHAT_ID, users, users))
+        cursor.execute("""
+            INSERT INTO warnings (user_id, issued_by, reason)
+            SELECT user_id, ?, 'seed' FROM users WHERE warnings_count > 0
+        """, (BENCH_OPERATOR_ID,))
+    db.rebuild_weekly_scores()
@@ -0,0 +1,193 @@
+"""Replay recorded updates through the dispatcher against a fake Bot API.
+
+Segments written with RECORD_UPDATES=true (see bot/utils/recorder.py) are
+fed back at their original pace, N times faster, or as fast as possible.
+The bot runs against a copy of a database file, or a fresh one with a
+daily task, so production traffic can be reproduced and profiled offline.
+
+Run with:
+    python -m benchmarks.replay data/updates --speed 1
+    python -m benchmarks.replay data/updates --speed 10 --db data/bot.db
+    python -m benchmarks.replay data/updates --speed 0 --concurrency 16
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+import time
+from collections import Counter, defaultdict
+from datetime import datetime
+from typing import Any, Dict, List
+
+
+def apply_env(args) -> None:
+    """Point bot config at the recorded chat before bot modules load."""
+    if args.chat_id:
+        os.environ["CHAT_ID"] = str(args.chat_id)
+    if args.thread_id is not None:
+        os.environ["FLOOD_THREAD_ID"] = str(args.thread_id)
+    if args.operator_ids:
+        os.environ["OPERATOR_IDS"] = args.operator_ids
+    os.environ["RECORD_UPDATES"] = "false"
+
+    from benchmarks.fixtures import configure_env
+    configure_env()
+
+
+def handler_means() -> Dict[str, Dict[str, float]]:
+    """Per-handler count and mean time from the bot's own metrics."""
+    from bot.utils import metrics
+
+    result = {}
+    for (handler,), series in metrics.handler_duration.values.items():
+        count = sum(series[:-1])
+        result[handler] = {
+            "count": count,
+            "mean_ms": round(series[-1] / count * 1000, 4) if count else 0.0,
+        }
+    return result
+
+
+async def replay(entries: List[Dict[str, Any]], args) -> Dict[str, Any]:
+    """Feed entries through the dispatcher and collect timings."""
+    from aiogram.types import Update
+
+    from database import Database
+    from benchmarks.fake_api import create_fake_bot
+    from benchmarks.fixtures import seed_database, use_database
+    from benchmarks.stats import summarize
+    from benchmarks.throughput import build_dispatcher
+
+    bot = create_fake_bot(latency=args.api_latency_ms / 1000, bot_id=args.bot_id)
+    dp = build_dispatcher(bot)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "replay.db")
+        if args.db:
+            shutil.copyfile(args.db, db_path)
+        db = Database(db_path)
+        if not args.db:
+            seed_database(db, users=0, points=0)
+        use_database(db)
+
+        latencies: Dict[str, List[float]] = defaultdict(list)
+        lags: List[float] = []
+        errors: Counter = Counter()
+        semaphore = asyncio.Semaphore(args.concurrency)
+
+        async def feed(update: Update) -> None:
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    await dp.feed_update(bot, update)
+                except Exception as e:
+                    errors[type(e).__name__] += 1
+                latencies[update.event_type].append(time.perf_counter() - start)
+
+        tasks = []
+        first_at = entries[0]["t"] if entries else 0.0
+        started = time.perf_counter()
+        for entry in entries:
+            update = Update.model_validate(entry["update"], context={"bot": bot})
+            if args.speed > 0:
+                due = (entry["t"] - first_at) / args.speed
+                delay = due - (time.perf_counter() - started)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                elif delay < -0.001:
+                    lags.append(-delay)
+                # Like polling: each update runs as its own task
+                tasks.append(asyncio.create_task(feed(update)))
+            elif args.concurrency == 1:
+                await feed(update)
+            else:
+                tasks.append(asyncio.create_task(feed(update)))
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - started
+
+    await bot.session.close()
+    all_latencies = [value for values in latencies.values() for value in values]
+    return {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "params": vars(args),
+        "updates": len(entries),
+        "recorded_seconds": round(entries[-1]["t"] - first_at, 3) if entries else 0.0,
+        "seconds": round(elapsed, 4),
+        "updates_per_second": round(len(entries) / elapsed, 2) if elapsed else 0.0,
+        "latency": summarize(all_latencies),
+        "update_types": {name: summarize(values) for name, values in sorted(latencies.items())},
+        "handlers": handler_means(),
+        "schedule_lag": summarize(lags),
+        "errors": dict(errors),
+        "api_calls": dict(bot.session.calls),
+    }
+
+
+def print_result(result: Dict[str, Any]) -> None:
+    print(f"\nReplayed {result['updates']} updates recorded over "
+          f"{result['recorded_seconds']:.1f}s in {result['seconds']:.1f}s "
+          f"({result['updates_per_second']:.1f} updates/s)")
+    print(f"  {'update type':<16} {'count':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name, stats in list(result["update_types"].items()) + [("all", result["latency"])]:
+        print(f"  {name:<16} {stats['count']:>7} {stats['p50_ms']:>9.3f} "
+              f"{stats['p95_ms']:>9.3f} {stats['p99_ms']:>9.3f}")
+    print(f"\n  {'handler':<28} {'count':>7} {'mean ms':>9}")
+    for name, stats in sorted(result["handlers"].items(), key=lambda item: -item[1]["mean_ms"]):
+        print(f"  {name:<28} {stats['count']:>7} {stats['mean_ms']:>9.3f}")
+    lag = result["schedule_lag"]
+    if lag["count"]:
+        print(f"\n  behind schedule: {lag['count']} updates, p95 {lag['p95_ms']:.1f} ms")
+    if result["errors"]:
+        print(f"  errors: {result['errors']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded updates")
+    parser.add_argument("paths", nargs="+", help="segment files or directories")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="1 = original timing, N = N times faster, 0 = as fast as possible")
+    parser.add_argument("--concurrency", type=int, default=1,
+                        help="in-flight updates when --speed 0")
+    parser.add_argument("--limit", type=int, default=None, help="replay at most N updates")
+    parser.add_argument("--db", default=None,
+                        help="database to replay against (copied, never modified)")
+    parser.add_argument("--chat-id", type=int, default=None, help="CHAT_ID of the recording")
+    parser.add_argument("--thread-id", type=int, default=None, help="FLOOD_THREAD_ID")
+    parser.add_argument("--operator-ids", default=None, help="OPERATOR_IDS")
+    parser.add_argument("--bot-id", type=int, default=None,
+                        help="id of the recorded bot, so replies to it are recognised")
+    parser.add_argument("--api-latency-ms", type=float, default=0.0,
+                        help="simulated Bot API round-trip time")
+    parser.add_argument("--output", default=None,
+                        help="JSON result path (default benchmarks/results/replay-<time>.json)")
+    args = parser.parse_args()
+
+    apply_env(args)
+    from bot.utils.recorder import read_segments
+
+    entries = []
+    for entry in read_segments(args.paths):
+        entries.append(entry)
+        if args.limit and len(entries) >= args.limit:
+            break
+    if not entries:
+        parser.error("no recorded updates found")
+
+    result = asyncio.run(replay(entries, args))
+    print_result(result)
+
+    output = args.output or os.path.join(
+        "benchmarks", "results",
+        f"replay-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json",
+    )
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    print(f"\nResults written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,287 @@
+"""End-to-end update throughput benchmark for the bot routers.
+
+Synthetic updates (Flood chatter, photo task replies, /top spam and approve
+callbacks) are fed through Dispatcher.feed_update against a fake Bot API.
+Throughput and per-scenario latency percentiles are reported for each
+database size and written as JSON for later comparison.
+
+Run with:
+    python -m benchmarks.throughput --sizes 1000,10000 --updates 5000
+    python -m benchmarks.throughput --compare benchmarks/results/old.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, List, Tuple
+
+from benchmarks.fixtures import (
+    BENCH_CHAT_ID,
+    BENCH_OPERATOR_ID,
+    BENCH_THREAD_ID,
+    configure_env,
+    seed_database,
+    use_database,
+)
+
+configure_env()
+
+from aiogram import Bot, Dispatcher, __version__ as aiogram_version  # noqa: E402
+from aiogram.types import Update  # noqa: E402
+
+from database import Database  # noqa: E402
+from benchmarks.fake_api import create_fake_bot  # noqa: E402
+from benchmarks.stats import summarize  # noqa: E402
+
+SCENARIOS = ("chatter", "photo_reply", "top", "approve")
+DEFAULT_MIX = "chatter:70,photo_reply:10,top:15,approve:5"
+WORDS = ("привет", "как", "дела", "сегодня", "задание", "python", "код", "чат", "идея", "проект")
+
+
+def build_dispatcher(bot: Bot) -> Dispatcher:
+    """Create a dispatcher wired like main.py."""
+    from bot.handlers import operator, user
+    from bot.middlewares import setup_middlewares
+
+    dp = Dispatcher()
+    setup_middlewares(dp, bot)
+    dp.include_router(user.router)
+    dp.include_router(operator.router)
+    return dp
+
+
+class UpdateFactory:
+    """Generate raw update payloads for each scenario."""
+
+    def __init__(self, bot: Bot, users: int, pending_answer_ids: List[int],
+                 rng: random.Random):
+        self.bot = bot
+        self.users = users
+        self.pending = list(pending_answer_ids)
+        self.rng = rng
+        self.update_id = 0
+        self.message_id = 1000
+
+    def _next_ids(self) -> Tuple[int, int]:
+        self.update_id += 1
+        self.message_id += 1
+        return self.update_id, self.message_id
+
+    def _user(self, user_id: int) -> Dict[str, Any]:
+        return {"id": user_id, "is_bot": False, "first_name": f"User {user_id}",
+                "username": f"user{user_id}"}
+
+    def _group_message(self, message_id: int, user_id: int) -> Dict[str, Any]:
+        return {
+            "message_id": message_id,
+            "date": int(time.time()),
+            "chat": {"id": BENCH_CHAT_ID, "type": "supergroup", "title": "Bench",
+                     "is_forum": True},
+            "from": self._user(user_id),
+            "message_thread_id": BENCH_THREAD_ID,
+            "is_topic_message": True,
+        }
+
+    def chatter(self) -> Dict[str, Any]:
+        update_id, message_id = self._next_ids()
+        message = self._group_message(message_id, self.rng.randint(1, self.users))
+        message["text"] = " ".join(self.rng.choices(WORDS, k=self.rng.randint(2, 15)))
+        return {"update_id": update_id, "message": message}
+
+    def photo_reply(self) -> Dict[str, Any]:
+        update_id, message_id = self._next_ids()
+        message = self._group_message(message_id, self.rng.randint(1, self.users))
+        unique = f"photo{update_id}"
+        message["photo"] = [{"file_id": f"id-{unique}", "file_unique_id": unique,
+                             "width": 1280, "height": 960}]
+        reply = self._group_message(1, self.bot.id)
+        reply["from"] = {"id": self.bot.id, "is_bot": True, "first_name": "Bot"}
+        reply["text"] = "НОВОЕ ЗАДАНИЕ!"
+        message["reply_to_message"] = reply
+        return {"update_id": update_id, "message": message}
+
+    def top(self) -> Dict[str, Any]:
+        update_id, message_id = self._next_ids()
+        message = self._group_message(message_id, self.rng.randint(1, self.users))
+        message["text"] = "/top"
+        message["entities"] = [{"type": "bot_command", "offset": 0, "length": 4}]
+        return {"update_id": update_id, "message": message}
+
+    def approve(self) -> Dict[str, Any]:
+        if not self.pending:
+            return self.top()
+        update_id, message_id = self._next_ids()
+        answer_id = self.pending.pop()
+        return {
+            "update_id": update_id,
+            "callback_query": {
+                "id": str(update_id),
+                "from": self._user(BENCH_OPERATOR_ID),
+                "chat_instance": "bench",
+                "data": f"approve_{answer_id}",
+                "message": {
+                    "message_id": message_id,
+                    "date": int(time.time()),
+                    "chat": {"id": BENCH_OPERATOR_ID, "type": "private"},
+                    "from": {"id": self.bot.id, "is_bot": True, "first_name": "Bot"},
+                    "caption": f"Answer ID: {answer_id}",
+                    "photo": [{"file_id": "x", "file_unique_id": "x",
+                               "width": 1, "height": 1}],
+                },
+            },
+        }
+
+
+def parse_mix(mix: str) -> Dict[str, int]:
+    """Parse 'scenario:weight,...' into a dict."""
+    weights = {}
+    for part in mix.split(","):
+        name, weight = part.split(":")
+        if name not in SCENARIOS:
+            raise ValueError(f"Unknown scenario: {name}")
+        weights[name] = int(weight)
+    return weights
+
+
+async def run_size(dp: Dispatcher, bot: Bot, users: int, args) -> Dict[str, Any]:
+    """Seed a database of the given size and push the update mix through."""
+    rng = random.Random(args.seed)
+    weights = parse_mix(args.mix)
+    plan = rng.choices(list(weights), weights=list(weights.values()), k=args.updates)
+    approvals = plan.count("approve")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, "bench.db"))
+        seeded = seed_database(db, users, users * args.points_per_user,
+                               answers=approvals, rng=rng)
+        use_database(db)
+        bot.session.reset()
+
+        factory = UpdateFactory(bot, users, seeded["pending_answer_ids"], rng)
+        updates = [
+            (name, Update.model_validate(getattr(factory, name)(), context={"bot": bot}))
+            for name in plan
+        ]
+
+        latencies: Dict[str, List[float]] = defaultdict(list)
+        semaphore = asyncio.Semaphore(args.concurrency)
+
+        async def feed(name: str, update: Update) -> None:
+            async with semaphore:
+                start = time.perf_counter()
+                await dp.feed_update(bot, update)
+                latencies[name].append(time.perf_counter() - start)
+
+        started = time.perf_counter()
+        if args.concurrency == 1:
+            for name, update in updates:
+                await feed(name, update)
+        else:
+            await asyncio.gather(*(feed(name, update) for name, update in updates))
+        elapsed = time.perf_counter() - started
+
+    all_latencies = [value for values in latencies.values() for value in values]
+    return {
+        "users": users,
+        "points": users * args.points_per_user,
+        "updates": len(updates),
+        "seconds": round(elapsed, 4),
+        "updates_per_second": round(len(updates) / elapsed, 2),
+        "latency": summarize(all_latencies),
+        "scenarios": {name: summarize(values) for name, values in sorted(latencies.items())},
+        "api_calls": dict(bot.session.calls),
+    }
+
+
+def print_run(run: Dict[str, Any]) -> None:
+    print(f"\nusers={run['users']} points={run['points']} updates={run['updates']}")
+    print(f"  throughput: {run['updates_per_second']:.1f} updates/s")
+    print(f"  {'scenario':<12} {'count':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name, stats in list(run["scenarios"].items()) + [("all", run["latency"])]:
+        print(f"  {name:<12} {stats['count']:>7} {stats['p50_ms']:>9.3f} "
+              f"{stats['p95_ms']:>9.3f} {stats['p99_ms']:>9.3f}")
+
+
+def compare(current: Dict[str, Any], baseline_path: str) -> None:
+    """Print throughput and p95 changes against a previous result file."""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    previous = {run["users"]: run for run in baseline["runs"]}
+
+    print(f"\nComparison with {baseline_path}:")
+    for run in current["runs"]:
+        old = previous.get(run["users"])
+        if not old:
+            print(f"  users={run['users']}: no baseline")
+            continue
+        ratio = run["updates_per_second"] / old["updates_per_second"]
+        print(f"  users={run['users']}: throughput x{ratio:.2f}")
+        for name, stats in run["scenarios"].items():
+            old_stats = old["scenarios"].get(name)
+            if old_stats and old_stats["p95_ms"]:
+                change = stats["p95_ms"] / old_stats["p95_ms"]
+                print(f"    {name:<12} p95 {old_stats['p95_ms']:.3f} -> "
+                      f"{stats['p95_ms']:.3f} ms (x{change:.2f})")
+
+
+async def main_async(args) -> Dict[str, Any]:
+    bot = create_fake_bot(latency=args.api_latency_ms / 1000)
+    dp = build_dispatcher(bot)
+    runs = []
+    for users in (int(size) for size in args.sizes.split(",")):
+        run = await run_size(dp, bot, users, args)
+        print_run(run)
+        runs.append(run)
+    await bot.session.close()
+    return {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "aiogram": aiogram_version,
+        "params": vars(args),
+        "runs": runs,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Update throughput benchmark")
+    parser.add_argument("--sizes", default="1000,10000",
+                        help="comma-separated user counts to seed")
+    parser.add_argument("--points-per-user", type=int, default=20)
+    parser.add_argument("--updates", type=int, default=2000)
+    parser.add_argument("--mix", default=DEFAULT_MIX,
+                        help=f"scenario weights (default {DEFAULT_MIX})")
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--api-latency-ms", type=float, default=0.0,
+                        help="simulated Bot API round-trip time")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None,
+                        help="JSON result path (default benchmarks/results/throughput-<time>.json)")
+    parser.add_argument("--compare", default=None, help="baseline JSON to compare against")
+    args = parser.parse_args()
+
+    result = asyncio.run(main_async(args))
+
+    output = args.output or os.path.join(
+        "benchmarks", "results",
+        f"throughput-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json",
+    )
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    print(f"\nResults written to {output}")
+
+    if args.compare:
+        compare(result, args.compare)
+
+
+if __name__ == "__main__":
+    main()
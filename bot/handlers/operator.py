@@ -1,16 +1,30 @@
 """Operator handlers for ChatQuestBot."""
 
+import html
 import logging
+import os
+from typing import Optional
 from aiogram import Router, F
+from aiogram.exceptions import TelegramBadRequest
 from aiogram.filters import Command
-from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
-
-from database import Database
+from aiogram.types import (
+    BufferedInputFile,
+    CallbackQuery,
+    InlineKeyboardButton,
+    InlineKeyboardMarkup,
+    Message,
+)
+
+from database import SEARCH_MATCH_END, SEARCH_MATCH_START, Database
 from config import Config
+from bot.middlewares.tracing import trace_router
+from bot.utils import profiler
+from bot.utils.users import resolve_target, resolve_targets
 
 logger = logging.getLogger(__name__)
 
-router = Router()
+router = Router(name="operator")
+trace_router(router)
 db = Database()
 
 
@@ -45,22 +59,24 @@ def create_moderation_keyboard() -> InlineKeyboardMarkup:
 
 
 async def send_stats(message: Message):
-    """Send all users statistics (no permission check)."""
-    stats = db.get_all_users_stats()
+    """Send users statistics of every chat (no permission check)."""
+    for chat_id in Config.CHATS:
+        stats = await db.aio.get_all_users_stats(chat_id)
+        title = f" (чат {chat_id})" if len(Config.CHATS) > 1 else ""
 
-    if not stats:
-        await message.answer("Нет данных по пользователям.")
-        return
+        if not stats:
+            await message.answer(f"Нет данных по пользователям{title}.")
+            continue
 
-    text = "Статистика участников:\n\n"
-    for idx, user in enumerate(stats, 1):
-        username = user["username"] or user["first_name"]
-        points = user["total_points"]
-        warnings = user["warnings_count"]
-        banned = " [BANNED]" if user["is_banned"] else ""
-        text += f"{idx}. @{username} - {points} points | warnings: {warnings}{banned}\n"
+        text = f"Статистика участников{title}:\n\n"
+        for idx, user in enumerate(stats, 1):
+            username = user["username"] or user["first_name"]
+            points = user["total_points"]
+            warnings = user["warnings_count"]
+            banned = " [BANNED]" if user["is_banned"] else ""
+            text += f"{idx}. @{username} - {points} points | warnings: {warnings}{banned}\n"
 
-    await message.answer(text)
+        await message.answer(text)
 
 
 @router.message(Command("stats"))
@@ -74,6 +90,78 @@ async def cmd_stats(message: Message):
     await send_stats(message)
 
 
+async def send_db_stats(message: Message):
+    """Send per-method query timings (no permission check)."""
+    stats = db.get_query_stats()
+
+    if not stats:
+        await message.answer("Нет данных о запросах.")
+        return
+
+    top = sorted(stats.items(), key=lambda item: item[1]["total_ms"], reverse=True)[:15]
+    text = "Запросы к БД (по суммарному времени):\n\n"
+    for method, entry in top:
+        text += (
+            f"{method}: {entry['count']} шт, всего {entry['total_ms']:.0f} мс, "
+            f"среднее {entry['mean_ms']:.2f} мс, p95 ≤{entry['p95_ms']:g} мс, "
+            f"макс {entry['max_ms']:.1f} мс\n"
+        )
+
+    await message.answer(text)
+
+
+@router.message(Command("db_stats"))
+async def cmd_db_stats(message: Message):
+    """Show database query timings (operators only, private only)."""
+    if not is_private_chat(message):
+        return
+    if not is_operator(message.from_user.id):
+        await message.answer("Эта команда доступна только операторам.")
+        return
+    await send_db_stats(message)
+
+
+@router.message(Command("profile"))
+async def cmd_profile(message: Message):
+    """Profile the running bot for N seconds (operators only, private only)."""
+    if not is_private_chat(message):
+        return
+    if not is_operator(message.from_user.id):
+        await message.answer("Эта команда доступна только операторам.")
+        return
+
+    # Parse command: /profile [seconds] [busy|wall]
+    args = message.text.split()[1:]
+    seconds = 10
+    mode = "busy"
+    try:
+        for arg in args:
+            if arg in profiler.MODES:
+                mode = arg
+            else:
+                seconds = float(arg)
+        await message.answer(f"Профилирование ({mode}) на {seconds:g} с...")
+        result = await profiler.profile(seconds, mode)
+    except ValueError:
+        await message.answer(
+            "Использование: /profile [секунды] [busy|wall]\n"
+            f"Длительность от 0 до {profiler.MAX_SECONDS} с."
+        )
+        return
+    except profiler.ProfilerBusy:
+        await message.answer("Профилирование уже запущено.")
+        return
+
+    path = result.write(Config.PROFILE_DIR)
+    await message.answer(profiler.format_summary(result), parse_mode=None)
+    with open(path, "rb") as f:
+        await message.answer_document(
+            BufferedInputFile(f.read(), filename=os.path.basename(path)),
+            caption="Collapsed stacks для flamegraph.pl / speedscope",
+        )
+    logger.info("Profile written to %s", path)
+
+
 @router.message(Command("warn"))
 async def cmd_warn(message: Message):
     """Issue a warning to a user (operators only, private only)."""
@@ -83,43 +171,36 @@ async def cmd_warn(message: Message):
         await message.answer("Эта команда доступна только операторам.")
         return
 
-    # Parse command: /warn @username [reason]
-    parts = message.text.split(maxsplit=2)
-    if len(parts) < 2:
+    # Parse command: /warn @username|user_id [reason], or reply with /warn [reason]
+    parts = message.text.split(maxsplit=1)
+    args = parts[1] if len(parts) > 1 else ""
+    user_id, target, reason = await resolve_target(message, args)
+
+    if not user_id and not target:
         await message.answer(
             "Использование: /warn @username [причина]\n"
             "Пример: /warn @user спам короткими сообщениями"
         )
         return
 
-    target = parts[1]
-    reason = parts[2] if len(parts) > 2 else "Нарушение правил"
-    user_id = None
-
-    if target.startswith("@"):
-        username = target[1:]
-        with db.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT user_id FROM users WHERE username = ?", (username,))
-            row = cursor.fetchone()
-            if row:
-                user_id = row["user_id"]
-    elif target.isdigit():
-        user_id = int(target)
+    reason = reason or "Нарушение правил"
 
     if not user_id:
         await message.answer("Пользователь не найден в базе.")
         return
 
-    db.add_warning(
+    state = await db.aio.add_warning(
         user_id=user_id,
         issued_by=message.from_user.id,
         reason=reason,
+        max_warnings=Config.MAX_WARNINGS,
     )
+    if not state:
+        await message.answer("Пользователь не найден в базе.")
+        return
 
-    user = db.get_user(user_id)
-    warnings_count = user["warnings_count"]
-    is_banned = user["is_banned"]
+    warnings_count = state["warnings_count"]
+    is_banned = state["is_banned"]
 
     response = (
         "Предупреждение выдано.\n"
@@ -131,6 +212,12 @@ async def cmd_warn(message: Message):
         response += "\nПользователь исключен из геймификации."
     await message.answer(response)
 
+    await notify_warning(message.bot, user_id, reason, warnings_count, is_banned)
+
+
+async def notify_warning(bot, user_id: int, reason: str, warnings_count: int,
+                         is_banned: bool):
+    """Tell a user about a received warning."""
     try:
         user_message = (
             "Вы получили предупреждение.\n"
@@ -141,11 +228,96 @@ async def cmd_warn(message: Message):
             user_message += "\nВы исключены из геймификации на текущую неделю."
         else:
             user_message += f"\nОсталось до исключения: {Config.MAX_WARNINGS - warnings_count}"
-        await message.bot.send_message(user_id, user_message)
+        await bot.send_message(user_id, user_message)
     except Exception as e:
         logger.error("Failed to notify user %s: %s", user_id, e)
 
 
+async def parse_bulk_targets(message: Message):
+    """Split bulk command text into user IDs, unknown targets and reason."""
+    parts = message.text.split(maxsplit=1)
+    return await resolve_targets(parts[1] if len(parts) > 1 else "")
+
+
+@router.message(Command("mass_warn"))
+async def cmd_mass_warn(message: Message):
+    """Warn a list of users at once (operators only, private only)."""
+    if not is_private_chat(message):
+        return
+    if not is_operator(message.from_user.id):
+        await message.answer("Эта команда доступна только операторам.")
+        return
+
+    user_ids, unresolved, reason = await parse_bulk_targets(message)
+    if not user_ids and not unresolved:
+        await message.answer(
+            "Использование: /mass_warn @user1 @user2 123456 [причина]"
+        )
+        return
+
+    reason = reason or "Нарушение правил"
+    states = await db.aio.add_warnings(
+        user_ids,
+        issued_by=message.from_user.id,
+        reason=reason,
+        max_warnings=Config.MAX_WARNINGS,
+    )
+    unresolved += [str(uid) for uid in user_ids if uid not in states]
+
+    banned = sum(1 for state in states.values() if state["is_banned"])
+    response = (
+        f"Предупреждений выдано: {len(states)}\n"
+        f"Исключено из геймификации: {banned}\n"
+        f"Причина: {reason}"
+    )
+    if unresolved:
+        response += f"\nНе найдены: {', '.join(unresolved)}"
+    await message.answer(response)
+
+    for user_id, state in states.items():
+        await notify_warning(
+            message.bot, user_id, reason, state["warnings_count"], state["is_banned"]
+        )
+
+
+async def set_banned_bulk(message: Message, is_banned: bool):
+    """Ban or unban users listed in the command (no permission check)."""
+    user_ids, unresolved, _ = await parse_bulk_targets(message)
+    if not user_ids and not unresolved:
+        command = "/ban" if is_banned else "/unban"
+        await message.answer(f"Использование: {command} @user1 @user2 123456")
+        return
+
+    changed = await db.aio.set_banned(user_ids, is_banned)
+    action = "Исключено" if is_banned else "Восстановлено"
+    response = f"{action}: {len(changed)}"
+    if unresolved:
+        response += f"\nНе найдены: {', '.join(unresolved)}"
+    await message.answer(response)
+
+
+@router.message(Command("ban"))
+async def cmd_ban(message: Message):
+    """Exclude a list of users from gamification (operators only, private only)."""
+    if not is_private_chat(message):
+        return
+    if not is_operator(message.from_user.id):
+        await message.answer("Эта команда доступна только операторам.")
+        return
+    await set_banned_bulk(message, True)
+
+
+@router.message(Command("unban"))
+async def cmd_unban(message: Message):
+    """Return a list of users to gamification (operators only, private only)."""
+    if not is_private_chat(message):
+        return
+    if not is_operator(message.from_user.id):
+        await message.answer("Эта команда доступна только операторам.")
+        return
+    await set_banned_bulk(message, False)
+
+
 @router.callback_query(F.data.startswith("approve_"))
 async def callback_approve(callback: CallbackQuery):
     """Handle approve button callback."""
@@ -154,7 +326,7 @@ async def callback_approve(callback: CallbackQuery):
         return
 
     answer_id = int(callback.data.split("_")[1])
-    answer = db.get_answer(answer_id)
+    answer = await db.aio.get_answer(answer_id)
     if not answer:
         await callback.answer("Ответ не найден", show_alert=True)
         return
@@ -162,32 +334,24 @@ async def callback_approve(callback: CallbackQuery):
         await callback.answer("Этот ответ уже проверен", show_alert=True)
         return
 
-    db.update_answer_status(
+    reviewed = await db.aio.update_answer_status(
         answer_id=answer_id,
         status="approved",
         reviewed_by=callback.from_user.id,
     )
+    if not reviewed:
+        await callback.answer("Этот ответ уже проверен", show_alert=True)
+        return
 
-    with db.get_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute(
-            """
-            SELECT dt.*, t.points
-            FROM answers a
-            JOIN daily_tasks dt ON a.daily_task_id = dt.id
-            JOIN tasks t ON dt.task_id = t.task_id
-            WHERE a.answer_id = ?
-            """,
-            (answer_id,),
-        )
-        task_info = cursor.fetchone()
+    task_info = await db.aio.get_answer_task(answer_id)
 
     if not task_info:
         await callback.answer("Ошибка получения информации о задании", show_alert=True)
         return
 
     points = task_info["points"]
-    db.add_points(
+    await db.aio.add_points(
+        chat_id=task_info["chat_id"],
         user_id=answer["user_id"],
         points=points,
         reason="task_answer",
@@ -219,7 +383,7 @@ async def callback_reject(callback: CallbackQuery):
         return
 
     answer_id = int(callback.data.split("_")[1])
-    answer = db.get_answer(answer_id)
+    answer = await db.aio.get_answer(answer_id)
     if not answer:
         await callback.answer("Ответ не найден", show_alert=True)
         return
@@ -227,11 +391,14 @@ async def callback_reject(callback: CallbackQuery):
         await callback.answer("Этот ответ уже проверен", show_alert=True)
         return
 
-    db.update_answer_status(
+    reviewed = await db.aio.update_answer_status(
         answer_id=answer_id,
         status="rejected",
         reviewed_by=callback.from_user.id,
     )
+    if not reviewed:
+        await callback.answer("Этот ответ уже проверен", show_alert=True)
+        return
 
     current_caption = callback.message.caption or ""
     await callback.message.edit_caption(
@@ -291,11 +458,12 @@ async def callback_mod_warn(callback: CallbackQuery):
 
 
 async def send_task(message: Message):
-    """Send a task now (no permission check)."""
+    """Send a task to every chat now (no permission check)."""
     from bot.utils.scheduler import send_random_task
 
     try:
-        await send_random_task(message.bot)
+        for chat_id in Config.CHATS:
+            await send_random_task(message.bot, chat_id)
         await message.answer("Задание отправлено.")
     except Exception as e:
         logger.error("Failed to send task: %s", e)
@@ -314,11 +482,12 @@ async def cmd_send_task(message: Message):
 
 
 async def send_week_end(message: Message):
-    """Trigger week end results (no permission check)."""
+    """Trigger week end results in every chat (no permission check)."""
     from bot.utils.scheduler import send_week_results
 
     try:
-        await send_week_results(message.bot)
+        for chat_id in Config.CHATS:
+            await send_week_results(message.bot, chat_id)
         await message.answer("Итоги недели отправлены.")
     except Exception as e:
         logger.error("Failed to send week results: %s", e)
@@ -334,3 +503,179 @@ async def cmd_week_end(message: Message):
         await message.answer("Эта команда доступна только операторам.")
         return
     await send_week_end(message)
+
+
+def create_broadcast_keyboard(broadcast_id: str) -> InlineKeyboardMarkup:
+    """Create inline keyboard for controlling a broadcast."""
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [
+            InlineKeyboardButton(text="⏸ Пауза", callback_data=f"broadcast_pause_{broadcast_id}"),
+            InlineKeyboardButton(text="▶️ Продолжить", callback_data=f"broadcast_resume_{broadcast_id}"),
+        ],
+        [
+            InlineKeyboardButton(text="🗑 Отменить", callback_data=f"broadcast_cancel_{broadcast_id}"),
+            InlineKeyboardButton(text="🔄 Обновить", callback_data=f"broadcast_status_{broadcast_id}"),
+        ],
+    ])
+
+
+async def format_broadcast_status(broadcast_id: str) -> str:
+    """Describe the progress of a broadcast."""
+    counts = await db.aio.get_campaign_stats(f"broadcast:{broadcast_id}")
+    return (
+        f"📢 Рассылка {broadcast_id}\n\n"
+        f"Всего получателей: {sum(counts.values())}\n"
+        f"✅ Отправлено: {counts.get('sent', 0)}\n"
+        f"⏳ В очереди: {counts.get('pending', 0) + counts.get('sending', 0)}\n"
+        f"⏸ На паузе: {counts.get('paused', 0)}\n"
+        f"🚫 Заблокировали бота: {counts.get('blocked', 0)}\n"
+        f"❌ Ошибки: {counts.get('failed', 0)}\n"
+        f"🗑 Отменено: {counts.get('cancelled', 0)}"
+    )
+
+
+@router.message(Command("broadcast"))
+async def cmd_broadcast(message: Message):
+    """Queue an announcement for every registered user (operators only, private only)."""
+    if not is_private_chat(message):
+        return
+    if not is_operator(message.from_user.id):
+        await message.answer("Эта команда доступна только операторам.")
+        return
+
+    parts = message.html_text.split(maxsplit=1)
+    if len(parts) < 2:
+        await message.answer("Использование: /broadcast текст объявления")
+        return
+
+    broadcast_id = f"{message.from_user.id}-{message.message_id}"
+    queued = await db.aio.enqueue_all_users(f"broadcast:{broadcast_id}", parts[1])
+    logger.info("Broadcast %s queued for %d users", broadcast_id, queued)
+    await message.answer(
+        await format_broadcast_status(broadcast_id),
+        reply_markup=create_broadcast_keyboard(broadcast_id),
+    )
+
+
+@router.callback_query(F.data.startswith("broadcast_"))
+async def callback_broadcast(callback: CallbackQuery):
+    """Handle broadcast pause, resume, cancel and refresh buttons."""
+    if not is_operator(callback.from_user.id):
+        await callback.answer("Только операторы", show_alert=True)
+        return
+
+    _, action, broadcast_id = callback.data.split("_", 2)
+    campaign = f"broadcast:{broadcast_id}"
+    if action == "pause":
+        notice = f"На паузе: {await db.aio.pause_campaign(campaign)}"
+    elif action == "resume":
+        resumed = await db.aio.resume_campaign(campaign)
+        notice = f"Возвращено в очередь: {resumed}"
+    elif action == "cancel":
+        notice = f"Отменено: {await db.aio.cancel_campaign(campaign)}"
+    else:
+        notice = None
+
+    try:
+        await callback.message.edit_text(
+            await format_broadcast_status(broadcast_id),
+            reply_markup=create_broadcast_keyboard(broadcast_id),
+        )
+    except TelegramBadRequest:
+        # Nothing changed since the last refresh
+        pass
+    await callback.answer(notice)
+
+
+SEARCH_PAGE_SIZE = 5
+
+ANSWER_STATUS_ICONS = {
+    "pending": "⏳",
+    "approved": "✅",
+    "rejected": "❌",
+    "duplicate": "♻️",
+}
+
+
+def create_search_keyboard(page: int, has_next: bool) -> Optional[InlineKeyboardMarkup]:
+    """Create inline keyboard for paging through search results."""
+    buttons = []
+    if page > 0:
+        buttons.append(InlineKeyboardButton(text="⬅️ Назад", callback_data=f"search_{page - 1}"))
+    if has_next:
+        buttons.append(InlineKeyboardButton(text="Далее ➡️", callback_data=f"search_{page + 1}"))
+    return InlineKeyboardMarkup(inline_keyboard=[buttons]) if buttons else None
+
+
+def highlight(snippet: Optional[str]) -> str:
+    """Escape a search snippet for HTML and make its matches bold."""
+    return (
+        html.escape(snippet or "")
+        .replace(SEARCH_MATCH_START, "<b>")
+        .replace(SEARCH_MATCH_END, "</b>")
+    )
+
+
+async def format_search_results(query: str, page: int):
+    """Render one page of answer search results with its keyboard."""
+    hits = await db.aio.search_answers(
+        query, limit=SEARCH_PAGE_SIZE + 1, offset=page * SEARCH_PAGE_SIZE
+    )
+    has_next = len(hits) > SEARCH_PAGE_SIZE
+    # The query comes first, so page buttons can read it back from the message
+    text = f"🔎 {html.escape(query)}\n"
+    if not hits:
+        text += "\nНичего не найдено." if page == 0 else "\nБольше результатов нет."
+    else:
+        text += f"Страница {page + 1}\n"
+    for hit in hits[:SEARCH_PAGE_SIZE]:
+        author = f"@{hit['username']}" if hit["username"] else (hit["first_name"] or str(hit["user_id"]))
+        text += (
+            f"\n{ANSWER_STATUS_ICONS.get(hit['status'], '•')} #{hit['answer_id']} · "
+            f"{html.escape(author)} · {str(hit['answered_at'])[:16]}\n"
+            f"📝 {highlight(hit['task_snippet'])}\n"
+            f"{highlight(hit['content_snippet'])}\n"
+        )
+    return text, create_search_keyboard(page, has_next)
+
+
+@router.message(Command("search"))
+async def cmd_search(message: Message):
+    """Search text answers and task texts (operators only, private only)."""
+    if not is_private_chat(message):
+        return
+    if not is_operator(message.from_user.id):
+        await message.answer("Эта команда доступна только операторам.")
+        return
+
+    parts = message.text.split(maxsplit=1)
+    if len(parts) < 2:
+        await message.answer(
+            "Использование: /search слова для поиска\n"
+            "Слова ищутся по началу (ответ → ответы), \"фраза в кавычках\" — целиком."
+        )
+        return
+
+    # One line: the page buttons read the query back from the first line
+    # of the results
+    query = " ".join(parts[1].split())
+    text, keyboard = await format_search_results(query, 0)
+    await message.answer(text, reply_markup=keyboard)
+
+
+@router.callback_query(F.data.startswith("search_"))
+async def callback_search(callback: CallbackQuery):
+    """Handle search result page buttons."""
+    if not is_operator(callback.from_user.id):
+        await callback.answer("Только операторы", show_alert=True)
+        return
+
+    page = int(callback.data.split("_")[1])
+    query = callback.message.text.split("\n", 1)[0].removeprefix("🔎 ")
+    text, keyboard = await format_search_results(query, page)
+    try:
+        await callback.message.edit_text(text, reply_markup=keyboard)
+    except TelegramBadRequest:
+        # Nothing changed since the page was shown
+        pass
+    await callback.answer()
@@ -1,6 +1,9 @@
 """User handlers for ChatQuestBot."""
 
+import hashlib
 import logging
+import re
+from datetime import datetime
 from aiogram import Router, F
 from aiogram.filters import Command
 from aiogram.types import (
@@ -12,13 +15,35 @@ from aiogram.types import (
 )
 from aiogram.enums import ContentType
 
-from database import Database
+from database import Database, SYSTEM_ISSUER_ID
 from config import Config
+from bot.middlewares.tracing import trace_router
+from bot.utils.cache import VersionedCache
+from bot.utils.spam import SpamDetector
+from bot.utils.users import home_chat_id
 
 logger = logging.getLogger(__name__)
 
-router = Router()
+router = Router(name="user")
+trace_router(router)
 db = Database()
+leaderboard_cache = VersionedCache()
+spam_detector = SpamDetector(
+    window=Config.SPAM_WINDOW_SECONDS,
+    max_messages=Config.SPAM_MAX_MESSAGES,
+    short_length=Config.MIN_MESSAGE_LENGTH,
+    short_count=Config.SPAM_SHORT_COUNT,
+    short_ratio=Config.SPAM_SHORT_RATIO,
+    repeat_count=Config.SPAM_REPEAT_COUNT,
+    repeat_limit=Config.SPAM_REPEAT_LIMIT,
+    cooldown=Config.SPAM_COOLDOWN_SECONDS,
+)
+
+SPAM_REASONS = {
+    "rate": "Автоматически: слишком много сообщений подряд",
+    "short": "Автоматически: спам короткими сообщениями",
+    "repeat": "Автоматически: повтор одного и того же сообщения",
+}
 
 
 def is_private_chat(message: Message) -> bool:
@@ -45,23 +70,34 @@ def create_reply_menu_keyboard(is_operator: bool) -> ReplyKeyboardMarkup:
 
 
 def is_flood_thread(message: Message) -> bool:
-    """Check if message is in the Flood forum topic."""
+    """Check if message is in the Flood forum topic of its chat."""
     if message.chat.type not in ("group", "supergroup"):
         return False
-    if Config.FLOOD_THREAD_ID <= 0:
+    chat = Config.CHATS.get(message.chat.id)
+    if not chat or chat["flood_thread_id"] <= 0:
         return False
-    return message.message_thread_id == Config.FLOOD_THREAD_ID
+    return message.message_thread_id == chat["flood_thread_id"]
 
 
 def is_allowed_group_message(message: Message) -> bool:
-    """Allow only Flood topic messages in groups if configured."""
+    """Allow only configured chats in groups, and only their Flood topic if set."""
     if message.chat.type in ("group", "supergroup"):
-        if Config.FLOOD_THREAD_ID > 0:
+        chat = Config.CHATS.get(message.chat.id)
+        if not chat:
+            return False
+        if chat["flood_thread_id"] > 0:
             return is_flood_thread(message)
         return True
     return True
 
 
+async def scoring_chat_id(message: Message, user_id: int) -> int:
+    """Chat whose scores a message refers to (the home chat in private)."""
+    if is_private_chat(message):
+        return await home_chat_id(user_id)
+    return message.chat.id
+
+
 @router.message(Command("start"))
 async def cmd_start(message: Message):
     """Handle /start command."""
@@ -71,7 +107,7 @@ async def cmd_start(message: Message):
     user = message.from_user
 
     # Add user to database
-    db.add_user(
+    await db.aio.add_user(
         user_id=user.id,
         username=user.username,
         first_name=user.first_name,
@@ -166,36 +202,32 @@ async def send_my_points(message: Message, user):
     if not is_private_chat(message):
         return
 
-    user_id = user.id
+    # Registers unknown users and reads everything in one transaction
+    dashboard = await db.aio.get_user_dashboard(
+        chat_id=await home_chat_id(user.id),
+        user_id=user.id,
+        username=user.username,
+        first_name=user.first_name,
+        last_name=user.last_name,
+        is_operator=user.id in Config.OPERATOR_IDS
+    )
 
-    # Check if user is banned
-    if db.is_user_banned(user_id):
+    if dashboard["is_banned"]:
         await message.answer(
             "❌ Вы исключены из геймификации на эту неделю."
         )
         return
 
-    # Ensure user exists in database
-    if not db.get_user(user_id):
-        db.add_user(
-            user_id=user.id,
-            username=user.username,
-            first_name=user.first_name,
-            last_name=user.last_name,
-            is_operator=user.id in Config.OPERATOR_IDS
-        )
-
-    # Get user points
-    points = db.get_user_points(user_id)
-    db_user = db.get_user(user_id)
-
     text = (
-        f"💰 Твои баллы: {points}\n"
-        f"⚠️ Предупреждения: {db_user['warnings_count']}/{Config.MAX_WARNINGS}\n\n"
+        f"💰 Твои баллы: {dashboard['total_points']}\n"
+        f"⚠️ Предупреждения: {dashboard['warnings_count']}/{Config.MAX_WARNINGS}\n"
     )
+    if dashboard["rank"]:
+        text += f"🏆 Место в рейтинге: {dashboard['rank']}\n"
+    text += "\n"
 
-    # Get daily activity points
-    daily_points = db.get_daily_activity_points(user_id)
+    # Daily activity points
+    daily_points = dashboard["daily_activity_points"]
     remaining = Config.MAX_DAILY_ACTIVITY_POINTS - daily_points
 
     text += (
@@ -218,21 +250,16 @@ async def cmd_my_points(message: Message):
     await send_my_points(message, message.from_user)
 
 
-@router.message(Command("top"))
-async def cmd_top(message: Message):
-    """Show top users leaderboard."""
-    if not is_allowed_group_message(message):
-        return
-    is_flood = is_flood_thread(message)
-    leaderboard = db.get_leaderboard(limit=3 if is_flood else 10)
+async def render_leaderboard(chat_id: int, limit: int) -> str:
+    """Build leaderboard message text of a chat for the current week."""
+    leaderboard = await db.aio.get_leaderboard(chat_id, limit=limit)
 
     if not leaderboard:
-        await message.answer("🏆 Пока нет участников с баллами!")
-        return
+        return "🏆 Пока нет участников с баллами!"
 
     text = (
         "🏆 Подиум недели (Топ-3):\n\n"
-        if is_flood
+        if limit == 3
         else "🏆 Топ-10 участников недели:\n\n"
     )
 
@@ -245,6 +272,25 @@ async def cmd_top(message: Message):
 
         text += f"{medal} @{username} — {points} баллов\n"
 
+    return text
+
+
+@router.message(Command("top"))
+async def cmd_top(message: Message):
+    """Show top users leaderboard."""
+    if not is_allowed_group_message(message):
+        return
+    limit = 3 if is_flood_thread(message) else 10
+    chat_id = await scoring_chat_id(message, message.from_user.id)
+
+    # Cached per chat and week; a score change in the chat re-renders
+    year, week_number, _ = datetime.now().isocalendar()
+    text = await leaderboard_cache.get(
+        (chat_id, limit, week_number, year),
+        db.get_score_version(chat_id),
+        lambda: render_leaderboard(chat_id, limit),
+    )
+
     await message.answer(text)
 
 
@@ -297,22 +343,19 @@ async def handle_chat_activity(message: Message):
         return
 
     # Skip if user is banned
-    if db.is_user_banned(user_id):
+    if await db.aio.is_user_banned(user_id):
         return
 
-    # Ensure user exists in database
-    user = message.from_user
-    if not db.get_user(user_id):
-        db.add_user(
-            user_id=user.id,
-            username=user.username,
-            first_name=user.first_name,
-            last_name=user.last_name,
-            is_operator=user.id in Config.OPERATOR_IDS
-        )
+    if Config.SPAM_ENABLED:
+        rule = spam_detector.check(user_id, message.text or message.caption)
+        if rule:
+            await warn_spammer(message, rule)
+            return
+
+    # User row is kept current by UserSyncMiddleware
 
     # Check if this is a reply to a task
-    current_task = db.get_current_daily_task()
+    current_task = await db.aio.get_current_daily_task(message.chat.id)
     is_task_answer = False
 
     if message.reply_to_message and current_task:
@@ -324,6 +367,48 @@ async def handle_chat_activity(message: Message):
     # In Flood topic only task answers are processed.
 
 
+async def warn_spammer(message: Message, rule: str):
+    """Issue an automatic warning through the regular warning path."""
+    from bot.handlers.operator import notify_warning
+
+    user_id = message.from_user.id
+    reason = SPAM_REASONS[rule]
+    state = await db.aio.add_warning(
+        user_id=user_id,
+        issued_by=SYSTEM_ISSUER_ID,
+        reason=reason,
+        max_warnings=Config.MAX_WARNINGS,
+    )
+    if not state:
+        return
+    logger.info("Auto-warned user %s for spam (%s), warnings: %s",
+                user_id, rule, state["warnings_count"])
+    await notify_warning(message.bot, user_id, reason,
+                         state["warnings_count"], state["is_banned"])
+
+
+_NOT_WORD = re.compile(r"[\W_]+")
+
+
+def answer_fingerprint(message: Message, daily_task_id: int) -> str:
+    """Fingerprint an answer for duplicate detection.
+
+    Text is lowercased and stripped of punctuation and spacing before
+    hashing, so small edits of a copied answer still match; text
+    fingerprints are scoped to the daily task. Media is identified by
+    Telegram's file_unique_id, which is stable across forwards and reuploads
+    of the same file, so a reused photo or video matches on any task of
+    the chat.
+    """
+    if message.photo:
+        return f"photo:{message.chat.id}:{message.photo[-1].file_unique_id}"
+    if message.video:
+        return f"video:{message.chat.id}:{message.video.file_unique_id}"
+    normalized = _NOT_WORD.sub(" ", (message.text or "").lower()).strip()
+    digest = hashlib.blake2b(normalized.encode("utf-8"), digest_size=16).hexdigest()
+    return f"text:{daily_task_id}:{digest}"
+
+
 async def handle_task_answer(message: Message, task: dict):
     """Handle user's answer to a daily task."""
     user_id = message.from_user.id
@@ -345,15 +430,32 @@ async def handle_task_answer(message: Message, task: dict):
     elif content_type == "video":
         content = message.video.file_id
 
-    # Add answer to database
-    answer_id = db.add_answer(
+    # Add answer to database, rejecting repeats before operators see them
+    result = await db.aio.submit_answer(
         user_id=user_id,
         daily_task_id=task["id"],
         message_id=message.message_id,
         content_type=content_type,
-        content=content
+        content=content,
+        fingerprint=answer_fingerprint(message, task["id"]),
     )
 
+    if result["status"] == "answered":
+        if result["answer_status"] == "approved":
+            await message.reply("✅ Ваш ответ на это задание уже одобрен.")
+        else:
+            await message.reply("⏳ Вы уже отправили ответ на это задание, он ожидает проверки.")
+        return
+    if result["status"] == "duplicate":
+        if result["user_id"] == user_id:
+            await message.reply("❌ Этот ответ вы уже отправляли. Пришлите новый.")
+        else:
+            await message.reply("❌ Такой ответ уже отправил другой участник. Пришлите собственный ответ.")
+        logger.info("Duplicate answer from user %s (matches answer %s)", user_id, result["answer_id"])
+        return
+
+    answer_id = result["answer_id"]
+
     await message.reply(
         "✅ Ответ отправлен на проверку!\n"
         "Ожидайте одобрения оператора."
@@ -372,6 +474,7 @@ async def forward_to_operators(message: Message, answer_id: int, task: dict):
 
     caption = (
         f"📌 Новый ответ на задание:\n"
+        f"💬 Чат: {message.chat.title or message.chat.id}\n"
         f"👤 От: @{username}\n"
         f"🎯 Задание: {task['text']}\n"
         f"💰 Баллы: {task['points']}\n"
@@ -403,7 +506,7 @@ async def forward_to_operators(message: Message, answer_id: int, task: dict):
                     reply_markup=keyboard
                 )
         except Exception as e:
-            logger.error(f"Failed to forward to operator {operator_id}: {e}")
+            logger.error("Failed to forward to operator %s: %s", operator_id, e)
 
 
 async def track_activity(message: Message):
@@ -416,7 +519,8 @@ async def track_activity(message: Message):
         return
 
     # Check daily limit
-    daily_points = db.get_daily_activity_points(user_id)
+    chat_id = message.chat.id
+    daily_points = await db.aio.get_daily_activity_points(chat_id, user_id)
     if daily_points >= Config.MAX_DAILY_ACTIVITY_POINTS:
         return
 
@@ -427,13 +531,14 @@ async def track_activity(message: Message):
 
     if points > 0:
         # Update activity
-        db.update_chat_activity(user_id, words, points)
+        await db.aio.update_chat_activity(chat_id, user_id, words, points)
 
         # Add points
-        db.add_points(
+        await db.aio.add_points(
+            chat_id=chat_id,
             user_id=user_id,
             points=points,
             reason="chat_activity"
         )
 
-        logger.info(f"User {user_id} earned {points} points for activity")
+        logger.info("User %s earned %s points for activity", user_id, points)
@@ -0,0 +1,21 @@
+"""Middlewares package initialization."""
+
+from aiogram import Bot, Dispatcher
+
+from config import Config
+from bot.middlewares.metrics import HandlerMetricsMiddleware, TelegramApiMetricsMiddleware
+from bot.middlewares.ordering import OrderedDispatchMiddleware
+from bot.middlewares.users import UserSyncMiddleware
+
+
+def setup_middlewares(dp: Dispatcher, bot: Bot) -> None:
+    """Register bot middlewares on the dispatcher and the bot session."""
+    # Registered first so it wraps everything, including the user sync
+    dp.update.outer_middleware(OrderedDispatchMiddleware(Config.DISPATCH_CONCURRENCY))
+    dp.update.outer_middleware(UserSyncMiddleware())
+
+    # Inner middlewares on the root router also wrap handlers of sub-routers
+    dp.message.middleware(HandlerMetricsMiddleware())
+    dp.callback_query.middleware(HandlerMetricsMiddleware())
+
+    bot.session.middleware(TelegramApiMetricsMiddleware())
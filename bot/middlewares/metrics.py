@@ -0,0 +1,62 @@
+"""Middlewares feeding handler and Bot API metrics."""
+
+import time
+from typing import Any, Awaitable, Callable, Dict
+from aiogram import BaseMiddleware, Bot
+from aiogram.client.session.middlewares.base import (
+    BaseRequestMiddleware,
+    NextRequestMiddlewareType,
+)
+from aiogram.methods import TelegramMethod
+from aiogram.types import TelegramObject
+
+from bot.utils import metrics, tracing
+
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """Count updates and time handlers, labelled by handler name."""
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        handler_object = data.get("handler")
+        name = handler_object.callback.__name__ if handler_object else "unknown"
+        update = data.get("event_update")
+        update_type = update.event_type if update else "unknown"
+        tracing.set_handler(name)
+
+        start = time.perf_counter()
+        outcome = "ok"
+        try:
+            return await handler(event, data)
+        except Exception:
+            outcome = "error"
+            raise
+        finally:
+            metrics.handler_duration.observe(time.perf_counter() - start, name)
+            metrics.updates_total.inc(name, update_type, outcome)
+
+
+class TelegramApiMetricsMiddleware(BaseRequestMiddleware):
+    """Time outbound Bot API calls and count failures."""
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType,
+        bot: Bot,
+        method: TelegramMethod,
+    ):
+        name = method.__api_method__
+        start = time.perf_counter()
+        try:
+            return await make_request(bot, method)
+        except Exception as e:
+            metrics.telegram_api_errors.inc(name, type(e).__name__)
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            metrics.telegram_api_duration.observe(elapsed, name)
+            tracing.add_api_time(elapsed * 1000)
@@ -0,0 +1,58 @@
+"""Concurrency limit with per-user and per-answer ordering."""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, List
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Update
+
+from bot.utils.locks import KeyedLock
+
+# Callback data prefixes that act on an answer, e.g. "approve_42"
+ANSWER_CALLBACK_PREFIXES = ("approve_", "reject_")
+
+
+def ordering_keys(update: Update, data: Dict[str, Any]) -> List[Hashable]:
+    """Keys whose updates must be handled one at a time, in arrival order.
+
+    The user key always comes first: locks are taken in this order, and an
+    update waiting for its user's turn must not hold an answer lock.
+    """
+    keys: List[Hashable] = []
+    user = data.get("event_from_user")
+    if user:
+        keys.append(("user", user.id))
+
+    callback = update.callback_query
+    if callback and callback.data and callback.data.startswith(ANSWER_CALLBACK_PREFIXES):
+        answer_id = callback.data.split("_", 1)[1]
+        if answer_id.isdigit():
+            keys.append(("answer", int(answer_id)))
+    return keys
+
+
+class OrderedDispatchMiddleware(BaseMiddleware):
+    """Run at most `limit` updates at once, serialised per user and answer.
+
+    Updates first wait for the locks of their keys and only then for a free
+    slot, so a burst from one user queues behind its own lock without
+    occupying slots other users could use. asyncio locks are FIFO, and
+    polling starts one task per update in arrival order, so each user's
+    updates are handled in the order they were received.
+    """
+
+    def __init__(self, limit: int = 0):
+        """Initialize middleware; limit 0 means no concurrency limit."""
+        self.locks = KeyedLock()
+        self.semaphore = asyncio.Semaphore(limit) if limit > 0 else None
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        async with self.locks.acquire(*ordering_keys(event, data)):
+            if self.semaphore is None:
+                return await handler(event, data)
+            async with self.semaphore:
+                return await handler(event, data)
@@ -0,0 +1,24 @@
+"""Outer middleware recording incoming updates in polling mode."""
+
+from typing import Any, Awaitable, Callable, Dict
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+from bot.utils.recorder import UpdateRecorder
+
+
+class UpdateRecorderMiddleware(BaseMiddleware):
+    """Hand every update to the recorder before it is processed."""
+
+    def __init__(self, recorder: UpdateRecorder):
+        """Initialize middleware with a recorder."""
+        self.recorder = recorder
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        self.recorder.record(event)
+        return await handler(event, data)
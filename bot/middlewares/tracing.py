@@ -0,0 +1,65 @@
+"""Outer middleware tracing updates per router."""
+
+import time
+from typing import Any, Awaitable, Callable, Dict
+from aiogram import BaseMiddleware, Router
+from aiogram.dispatcher.event.bases import UNHANDLED
+from aiogram.types import TelegramObject
+
+from config import Config
+from bot.utils import tracing
+
+
+class TracingMiddleware(BaseMiddleware):
+    """Record wall, DB and Bot API time of each update handled by a router.
+
+    Updates the router does not handle are not recorded, so an update that
+    falls through one router is traced only by the router that handles it.
+    """
+
+    def __init__(self, router: Router):
+        """Initialize middleware for the given router."""
+        self.router_name = router.name
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        if not Config.TRACE_ENABLED:
+            return await handler(event, data)
+
+        update = data.get("event_update")
+        user = data.get("event_from_user")
+        chat = data.get("event_chat")
+        trace = tracing.Trace(
+            router=self.router_name,
+            update_id=update.update_id if update else None,
+            update_type=update.event_type if update else type(event).__name__,
+            user_id=user.id if user else None,
+            chat_id=chat.id if chat else None,
+        )
+        token = tracing.current_trace.set(trace)
+        outcome = "ok"
+        error = None
+        try:
+            result = await handler(event, data)
+            if result is UNHANDLED:
+                outcome = "unhandled"
+            return result
+        except Exception as e:
+            outcome = "error"
+            error = type(e).__name__
+            raise
+        finally:
+            tracing.current_trace.reset(token)
+            wall_ms = (time.perf_counter() - trace.start) * 1000
+            if outcome != "unhandled" and tracing.should_record(outcome, wall_ms):
+                tracing.write_record(trace.to_record(outcome, wall_ms, error))
+
+
+def trace_router(router: Router) -> None:
+    """Trace message and callback query updates reaching router."""
+    router.message.outer_middleware(TracingMiddleware(router))
+    router.callback_query.outer_middleware(TracingMiddleware(router))
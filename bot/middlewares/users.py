@@ -0,0 +1,31 @@
+"""Middleware that keeps stored user profiles current."""
+
+import logging
+from typing import Any, Awaitable, Callable, Dict
+from aiogram import BaseMiddleware
+from aiogram.types import Chat, TelegramObject, User
+
+from config import Config
+from bot.utils.users import remember_user
+
+logger = logging.getLogger(__name__)
+
+
+class UserSyncMiddleware(BaseMiddleware):
+    """Upsert the sender of every update, skipping unchanged profiles."""
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        user: User = data.get("event_from_user")
+        if user and not user.is_bot:
+            chat: Chat = data.get("event_chat")
+            chat_id = chat.id if chat and chat.id in Config.CHATS else None
+            try:
+                await remember_user(user, chat_id)
+            except Exception as e:
+                logger.error("Failed to sync user %s: %s", user.id, e)
+        return await handler(event, data)
@@ -0,0 +1,62 @@
+"""In-memory caches for rendered bot responses."""
+
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class VersionedCache:
+    """Cache values tagged with a data version, with single-flight loading.
+
+    A cached entry is served only while its version matches the version the
+    caller asks for, so bumping the version invalidates it without touching
+    the cache. Concurrent misses for the same key and version share a single
+    loader call.
+    """
+
+    def __init__(self):
+        """Initialize empty cache."""
+        self._values: Dict[Hashable, Tuple[int, Any]] = {}
+        self._inflight: Dict[Tuple[Hashable, int], asyncio.Future] = {}
+
+    async def get(self, key: Hashable, version: int,
+                  loader: Callable[[], Awaitable[Any]]) -> Any:
+        """Return cached value for key at version, loading it on a miss."""
+        cached = self._values.get(key)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+
+        flight_key = (key, version)
+        future = self._inflight.get(flight_key)
+        if future is not None:
+            return await asyncio.shield(future)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[flight_key] = future
+        try:
+            value = await loader()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark as retrieved so a miss without waiters doesn't log noise
+            future.exception()
+            raise
+        else:
+            current = self._values.get(key)
+            if current is None or current[0] <= version:
+                self._values[key] = (version, value)
+            future.set_result(value)
+            return value
+        finally:
+            self._inflight.pop(flight_key, None)
+
+    def invalidate(self, key: Hashable = None) -> None:
+        """Drop one cached key, or everything when key is None."""
+        if key is None:
+            self._values.clear()
+        else:
+            self._values.pop(key, None)
@@ -0,0 +1,120 @@
+"""Resumable, rate-limited delivery of queued private messages.
+
+Messages are queued in the outbox table per campaign (see
+Database.enqueue_messages) and sent by `deliver`, which claims them in
+batches, paces sends to DM_RATE_PER_SECOND and records the outcome of
+every message as soon as it is known. A sender that dies leaves its
+claimed messages in "sending"; after DM_CLAIM_TIMEOUT_SECONDS they are
+queued again, so nobody is skipped and at most the messages that were in
+flight at the crash (one per worker) can arrive twice. A message that was
+claimed DM_MAX_ATTEMPTS times is marked failed instead, so one that keeps
+crashing its sender cannot block the queue.
+
+A campaign's queued messages can be paused, resumed and cancelled by
+moving them between the "pending", "paused" and "cancelled" statuses.
+
+Outcomes: "sent"; "blocked" when the user has not started the bot or
+blocked it; "failed" when Telegram rejects the message or it failed
+DM_MAX_ATTEMPTS times.
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError, TelegramRetryAfter
+
+from config import Config
+from database import Database
+
+logger = logging.getLogger(__name__)
+
+db = Database()
+
+# One sender per process; several processes claim disjoint messages
+_lock = asyncio.Lock()
+
+
+class _Pacer:
+    """Spaces sends of all workers interval apart; a flood wait pauses them all."""
+
+    def __init__(self, rate: float):
+        self.interval = 1 / rate
+        self.next_at = time.monotonic()
+
+    async def wait(self) -> None:
+        now = time.monotonic()
+        # Reserve the next free slot; idle time does not accumulate a burst
+        at = max(self.next_at, now)
+        self.next_at = at + self.interval
+        if at > now:
+            await asyncio.sleep(at - now)
+
+    def pause(self, seconds: float) -> None:
+        self.next_at = max(self.next_at, time.monotonic() + seconds)
+
+
+async def _send(bot: Bot, message: Dict, pacer: _Pacer) -> Tuple[str, Optional[str]]:
+    """Send one message, waiting out flood limits. Returns status and error."""
+    while True:
+        await pacer.wait()
+        try:
+            await bot.send_message(chat_id=message["user_id"], text=message["text"])
+            return "sent", None
+        except TelegramRetryAfter as e:
+            logger.warning("Flood limit hit, pausing delivery for %s s", e.retry_after)
+            pacer.pause(e.retry_after)
+        except TelegramForbiddenError as e:
+            return "blocked", str(e)
+        except TelegramBadRequest as e:
+            return "failed", str(e)
+        except Exception as e:
+            logger.warning("Failed to deliver message %s to %s: %s",
+                           message["id"], message["user_id"], e)
+            retry = message["attempts"] < Config.DM_MAX_ATTEMPTS
+            return ("pending" if retry else "failed"), str(e)
+
+
+async def deliver(bot: Bot, budget: Optional[float] = None) -> Dict[str, int]:
+    """Send queued messages until the queue is empty or budget seconds pass.
+
+    DM_CONCURRENCY workers send at once, so slow API calls do not lower
+    the rate. Returns counts of outcomes ("pending" counts messages left
+    for a retry). If another delivery is running in this process, returns
+    at once with no counts.
+    """
+    counts: Dict[str, int] = {}
+    if _lock.locked():
+        return counts
+    async with _lock:
+        deadline = time.monotonic() + budget if budget is not None else None
+        pacer = _Pacer(Config.DM_RATE_PER_SECOND)
+        while deadline is None or time.monotonic() < deadline:
+            batch = deque(await db.aio.claim_messages(
+                Config.DM_BATCH_SIZE, Config.DM_CLAIM_TIMEOUT_SECONDS, Config.DM_MAX_ATTEMPTS
+            ))
+            if not batch:
+                break
+            unsent: List[int] = []
+
+            async def worker():
+                while batch:
+                    message = batch.popleft()
+                    if deadline is not None and time.monotonic() >= deadline:
+                        unsent.append(message["id"])
+                        continue
+                    status, error = await _send(bot, message, pacer)
+                    await db.aio.finish_message(message["id"], status, error)
+                    counts[status] = counts.get(status, 0) + 1
+
+            await asyncio.gather(*(worker() for _ in range(min(Config.DM_CONCURRENCY, len(batch)))))
+            if unsent:
+                await db.aio.release_messages(unsent)
+                logger.info("Delivery paused: %s", counts)
+                return counts
+    if counts:
+        logger.info("Delivery finished: %s", counts)
+    return counts
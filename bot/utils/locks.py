@@ -0,0 +1,52 @@
+"""Keyed asyncio locks."""
+
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Dict, Hashable, List
+
+
+class KeyedLock:
+    """One FIFO asyncio.Lock per key, created on demand.
+
+    Entries are reference counted and dropped when no task holds or waits
+    for them, so the table only contains keys that are currently in use.
+    Several keys are taken in the order given; callers must list them in a
+    consistent order (e.g. by kind) to rule out deadlocks.
+    """
+
+    def __init__(self):
+        """Initialize empty lock table."""
+        # key -> [lock, holders and waiters]
+        self._locks: Dict[Hashable, List] = {}
+
+    def __len__(self) -> int:
+        return len(self._locks)
+
+    def _release(self, key: Hashable, locked: bool) -> None:
+        entry = self._locks[key]
+        if locked:
+            entry[0].release()
+        entry[1] -= 1
+        if entry[1] == 0:
+            del self._locks[key]
+
+    @asynccontextmanager
+    async def acquire(self, *keys: Hashable):
+        """Hold the locks of all keys for the duration of the block."""
+        held = []
+        try:
+            for key in dict.fromkeys(keys):
+                entry = self._locks.get(key)
+                if entry is None:
+                    entry = self._locks[key] = [asyncio.Lock(), 0]
+                entry[1] += 1
+                try:
+                    await entry[0].acquire()
+                except BaseException:
+                    self._release(key, locked=False)
+                    raise
+                held.append(key)
+            yield
+        finally:
+            for key in reversed(held):
+                self._release(key, locked=True)
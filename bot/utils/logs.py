@@ -0,0 +1,146 @@
+"""Non-blocking logging setup.
+
+Loggers on the event loop thread only put records on a queue; a listener
+thread formats them and does the console and file I/O. The log file is
+JSON lines with size-based rotation. Repeated INFO and DEBUG records are
+rate limited per message template, which is why log calls pass arguments
+lazily ("%s", value) instead of formatting f-strings up front.
+"""
+
+import atexit
+import copy
+import json
+import logging
+import queue
+import sys
+import time
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Dict, List, Tuple
+
+from config import Config
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+# Attributes every LogRecord has; anything else came in through extra=
+_STANDARD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+_listeners: List[QueueListener] = []
+
+
+class JsonFormatter(logging.Formatter):
+    """Format records as one JSON object per line."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _STANDARD_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        if record.stack_info:
+            entry["stack"] = record.stack_info
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class RateLimitFilter(logging.Filter):
+    """Pass at most `limit` records per message template per window.
+
+    Only records up to max_level are limited; warnings and errors always
+    pass. The first record let through after a suppressed burst carries a
+    `suppressed` count. Pass extra={"rate_limit": False} to bypass.
+    """
+
+    def __init__(self, limit: int, window: float, max_level: int = logging.INFO):
+        """Initialize filter."""
+        super().__init__()
+        self.limit = limit
+        self.window = window
+        self.max_level = max_level
+        # (logger, template) -> [window start, passed, suppressed]
+        self._state: Dict[Tuple[str, str], List] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > self.max_level or not getattr(record, "rate_limit", True):
+            return True
+
+        key = (record.name, str(record.msg))
+        now = time.monotonic()
+        state = self._state.get(key)
+        if state is None or now - state[0] >= self.window:
+            if state and state[2]:
+                record.suppressed = state[2]
+            self._state[key] = [now, 1, 0]
+            return True
+        if state[1] < self.limit:
+            state[1] += 1
+            return True
+        state[2] += 1
+        return False
+
+
+class _QueueHandler(QueueHandler):
+    """QueueHandler that keeps exception text separate from the message.
+
+    The message is rendered here, on the calling thread, because its
+    arguments may change after the call returns.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def queue_handler(*handlers: logging.Handler) -> QueueHandler:
+    """Return a handler that hands records to handlers on a listener thread."""
+    records = queue.SimpleQueue()
+    listener = QueueListener(records, *handlers, respect_handler_level=True)
+    listener.start()
+    if not _listeners:
+        atexit.register(stop_logging)
+    _listeners.append(listener)
+    return _QueueHandler(records)
+
+
+def stop_logging() -> None:
+    """Flush queued records and stop listener threads."""
+    while _listeners:
+        _listeners.pop().stop()
+
+
+def setup_logging() -> None:
+    """Route root logging through a queue to the console and a rotating file."""
+    console = logging.StreamHandler(sys.stdout)
+    console.setFormatter(logging.Formatter(TEXT_FORMAT))
+
+    file_handler = RotatingFileHandler(
+        Config.LOG_FILE,
+        maxBytes=Config.LOG_MAX_BYTES,
+        backupCount=Config.LOG_BACKUP_COUNT,
+        encoding="utf-8",
+    )
+    file_handler.setFormatter(
+        JsonFormatter() if Config.LOG_JSON else logging.Formatter(TEXT_FORMAT)
+    )
+
+    handler = queue_handler(console, file_handler)
+    if Config.LOG_RATE_LIMIT:
+        handler.addFilter(RateLimitFilter(Config.LOG_RATE_LIMIT, Config.LOG_RATE_WINDOW))
+
+    root = logging.getLogger()
+    for existing in root.handlers[:]:
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(Config.LOG_LEVEL)
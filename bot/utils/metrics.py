@@ -0,0 +1,297 @@
+"""Prometheus-style metrics for the bot.
+
+Counters, gauges and histograms here are plain dict and list operations
+without locks: handlers, Bot API calls and jobs update them on the event
+loop thread only. Database statement timings are the exception: on
+PostgreSQL statements run in executor threads, so they are collected by
+database.query_stats, which takes a lock, and read from it at scrape time.
+Values are only turned into the text exposition format when /metrics is
+scraped, by collect(), which first refreshes the gauges read from the
+database without blocking the event loop.
+"""
+
+import asyncio
+import logging
+import time
+from bisect import bisect_left
+from functools import wraps
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from database import Database, LATENCY_BUCKETS_MS, query_stats
+
+logger = logging.getLogger(__name__)
+
+db = Database()
+
+# Default latency buckets in seconds
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+_registry: List["_Metric"] = []
+_collectors: List[Callable[[], Iterable[str]]] = []
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...],
+                   le: str = None) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if le is not None:
+        pairs.append(f'le="{le}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    """Base class holding name, help text and label names."""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        _registry.append(self)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    """Monotonically increasing value per label set."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = ()):
+        super().__init__(name, documentation, labels)
+        self.values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = self.header()
+        for labels, value in list(self.values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labels, labels)} {value}")
+        return lines
+
+
+class Gauge(_Metric):
+    """Value that is set directly or loaded by an async callback at scrape time."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str,
+                 callback: Optional[Callable[[], Awaitable[float]]] = None):
+        super().__init__(name, documentation)
+        self.callback = callback
+        # None while the latest refresh failed: the gauge is left out
+        self.value: Optional[float] = 0.0
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+    async def refresh(self) -> None:
+        """Load the value from the callback, if there is one."""
+        if self.callback is None:
+            return
+        try:
+            self.value = await self.callback()
+        except Exception as e:
+            logger.error("Failed to collect %s: %s", self.name, e)
+            self.value = None
+
+    def render(self) -> List[str]:
+        if self.value is None:
+            return []
+        return self.header() + [f"{self.name} {self.value}"]
+
+
+class Histogram(_Metric):
+    """Bucketed latency distribution per label set."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = buckets
+        # labels -> [per-bucket counts..., overflow count, sum]
+        self.values: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        series = self.values.get(labels)
+        if series is None:
+            series = self.values[labels] = [0] * (len(self.buckets) + 2)
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def time(self, *labels: str) -> "_Timer":
+        """Context manager observing the duration of its block."""
+        return _Timer(self, labels)
+
+    def render(self) -> List[str]:
+        lines = self.header()
+        for labels, series in list(self.values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                lines.append(
+                    f"{self.name}_bucket{_format_labels(self.labels, labels, f'{bound:g}')} "
+                    f"{cumulative}"
+                )
+            cumulative += series[len(self.buckets)]
+            lines.append(
+                f"{self.name}_bucket{_format_labels(self.labels, labels, '+Inf')} {cumulative}"
+            )
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, labels)} {series[-1]}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, labels)} {cumulative}")
+        return lines
+
+
+class _Timer:
+    def __init__(self, histogram: Histogram, labels: Tuple[str, ...]):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, *self.labels)
+
+
+def register_collector(collector: Callable[[], Iterable[str]]) -> None:
+    """Add a function producing extra exposition lines at scrape time."""
+    _collectors.append(collector)
+
+
+async def collect() -> str:
+    """Refresh the gauges that have callbacks, then render all metrics."""
+    for metric in _registry:
+        if isinstance(metric, Gauge):
+            await metric.refresh()
+    return render()
+
+
+def render() -> str:
+    """Render all metrics in the Prometheus text exposition format."""
+    lines: List[str] = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    for collector in _collectors:
+        try:
+            lines.extend(collector())
+        except Exception as e:
+            logger.error("Metrics collector failed: %s", e)
+    return "\n".join(lines) + "\n"
+
+
+# Bot metrics
+updates_total = Counter(
+    "bot_updates_total", "Updates processed per handler",
+    ("handler", "update_type", "outcome"),
+)
+handler_duration = Histogram(
+    "bot_handler_duration_seconds", "Handler wall time", ("handler",),
+)
+telegram_api_duration = Histogram(
+    "bot_telegram_api_duration_seconds", "Outbound Bot API call latency", ("method",),
+)
+telegram_api_errors = Counter(
+    "bot_telegram_api_errors_total", "Failed Bot API calls", ("method", "error"),
+)
+job_duration = Histogram(
+    "bot_job_duration_seconds", "Scheduled job duration", ("job",),
+    buckets=(0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0),
+)
+job_failures = Counter("bot_job_failures_total", "Scheduled job failures", ("job",))
+pending_answers = Gauge(
+    "bot_pending_answers", "Answers waiting for operator review",
+    callback=lambda: db.aio.count_pending_answers(),
+)
+
+
+def _db_query_lines() -> Iterable[str]:
+    """Expose Database query timings collected by database.query_stats."""
+    name = "bot_db_query_duration_seconds"
+    yield f"# HELP {name} Database statement latency per Database method"
+    yield f"# TYPE {name} histogram"
+    for method, entry in query_stats.entries().items():
+        cumulative = 0
+        for bound_ms, count in zip(LATENCY_BUCKETS_MS, entry["buckets"]):
+            cumulative += count
+            le = "+Inf" if bound_ms == float("inf") else f"{bound_ms / 1000:g}"
+            yield f"{name}_bucket{_format_labels(('method',), (method,), le)} {cumulative}"
+        yield f"{name}_sum{_format_labels(('method',), (method,))} {entry['total_ms'] / 1000}"
+        yield f"{name}_count{_format_labels(('method',), (method,))} {entry['count']}"
+
+
+register_collector(_db_query_lines)
+
+
+def track_job(job: str):
+    """Decorator recording duration and failures of an async job."""
+    def decorator(func):
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            except Exception:
+                job_failures.inc(job)
+                raise
+            finally:
+                job_duration.observe(time.perf_counter() - start, job)
+        return wrapper
+    return decorator
+
+
+async def _handle_http(reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
+                       token: Optional[str] = None) -> None:
+    try:
+        request_line = await reader.readline()
+        authorization = None
+        while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+            name, _, value = line.decode("latin-1").partition(":")
+            if name.strip().lower() == "authorization":
+                authorization = value.strip()
+        parts = request_line.decode("latin-1").split()
+        if not (len(parts) >= 2 and parts[0] == "GET" and parts[1].split("?")[0] == "/metrics"):
+            body = b"Not Found\n"
+            status = "404 Not Found"
+            content_type = "text/plain"
+        elif token and authorization != f"Bearer {token}":
+            body = b"Unauthorized\n"
+            status = "401 Unauthorized"
+            content_type = "text/plain"
+        else:
+            body = (await collect()).encode("utf-8")
+            status = "200 OK"
+            content_type = CONTENT_TYPE
+        writer.write(
+            f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode("latin-1")
+            + body
+        )
+        await writer.drain()
+    except Exception as e:
+        logger.error("Metrics request failed: %s", e)
+    finally:
+        writer.close()
+
+
+async def start_metrics_server(port: int, host: str = "127.0.0.1",
+                               token: Optional[str] = None) -> asyncio.AbstractServer:
+    """Serve GET /metrics on a side port for polling mode.
+
+    With token set, requests need an "Authorization: Bearer <token>" header.
+    """
+    server = await asyncio.start_server(
+        lambda reader, writer: _handle_http(reader, writer, token), host, port
+    )
+    logger.info("Metrics exporter listening on %s:%s", host, port)
+    return server
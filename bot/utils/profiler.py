@@ -0,0 +1,211 @@
+"""On-demand sampling profiler for the running bot process.
+
+A background thread samples the stacks of all threads with
+sys._current_frames() at a fixed interval for the requested duration:
+the event loop thread and the executor threads that run database calls
+on PostgreSQL (see database.AsyncDatabase). Each stack starts with its
+thread, "event-loop" or the thread's name. Nothing runs between profiles,
+so the bot pays no cost when idle.
+
+In "wall" mode every sample counts. In "busy" mode samples of idle
+threads are dropped: the event loop waiting in its selector, and other
+threads waiting for work or on a lock. What is left is time spent running
+Python code and in blocking calls, including waits on the network, so
+this is not CPU time.
+
+Results are aggregated as collapsed stacks ("outer;inner count" lines),
+the input format of flamegraph.pl, speedscope and similar tools.
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Dict, List, Optional
+
+MODES = ("busy", "wall")
+MAX_SECONDS = 120
+DEFAULT_INTERVAL = 0.005
+
+# A thread whose innermost frame is one of these is idle: the event loop
+# waiting for I/O, an executor worker waiting for a job, or a thread
+# blocked on a condition or event
+_IDLE_FUNCTIONS = {
+    ("selectors.py", "select"),
+    ("selectors.py", "poll"),
+    ("thread.py", "_worker"),
+    ("threading.py", "wait"),
+}
+
+_running = threading.Lock()
+
+
+class ProfilerBusy(RuntimeError):
+    """Raised when a profile is requested while another one is running."""
+
+
+class ProfileResult:
+    """Collapsed stacks and summary of one profiling run."""
+
+    def __init__(self, mode: str, seconds: float, interval: float,
+                 stacks: Counter, samples: int, idle: int):
+        """Store raw profile data."""
+        self.mode = mode
+        self.seconds = seconds
+        self.interval = interval
+        self.stacks = stacks
+        self.samples = samples
+        self.idle = idle
+
+    def collapsed(self) -> str:
+        """Render stacks in collapsed format, one 'a;b;c count' line each."""
+        return "".join(
+            f"{stack} {count}\n" for stack, count in self.stacks.most_common()
+        )
+
+    def top_functions(self, limit: int = 15) -> List[Dict]:
+        """Functions by self samples, with inclusive samples alongside."""
+        own: Counter = Counter()
+        total: Counter = Counter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(";")
+            own[frames[-1]] += count
+            for frame in set(frames):
+                total[frame] += count
+        counted = sum(self.stacks.values()) or 1
+        return [
+            {
+                "function": function,
+                "self": count,
+                "self_pct": round(100 * count / counted, 1),
+                "total": total[function],
+                "total_pct": round(100 * total[function] / counted, 1),
+            }
+            for function, count in own.most_common(limit)
+        ]
+
+    def write(self, directory: str) -> str:
+        """Write collapsed stacks to a timestamped file and return its path."""
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(
+            directory,
+            f"profile-{self.mode}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.folded",
+        )
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.collapsed())
+        return path
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _is_idle(frame) -> bool:
+    code = frame.f_code
+    return (os.path.basename(code.co_filename), code.co_name) in _IDLE_FUNCTIONS
+
+
+def _thread_labels(loop_thread_id: int) -> Dict[int, str]:
+    labels = {thread.ident: thread.name for thread in threading.enumerate()}
+    labels[loop_thread_id] = "event-loop"
+    return labels
+
+
+def _sample(loop_thread_id: int, thread_id: Optional[int], mode: str, interval: float,
+            stop: threading.Event, stacks: Counter, counts: List[int]) -> None:
+    """Sampler thread body; counts is [samples, idle samples].
+
+    Samples thread_id only, or else every thread but the sampler.
+    """
+    own_id = threading.get_ident()
+    labels: Dict[object, str] = {}
+    thread_labels: Dict[int, str] = {}
+    next_tick = time.perf_counter()
+    while not stop.is_set():
+        frames_by_thread = sys._current_frames()
+        if (thread_id or loop_thread_id) not in frames_by_thread:
+            break
+        if thread_id is not None:
+            frames_by_thread = {thread_id: frames_by_thread[thread_id]}
+        for ident, frame in frames_by_thread.items():
+            if ident == own_id:
+                continue
+            counts[0] += 1
+            if mode == "busy" and _is_idle(frame):
+                counts[1] += 1
+                continue
+            frames = []
+            while frame is not None:
+                code = frame.f_code
+                label = labels.get(code)
+                if label is None:
+                    label = labels[code] = _frame_label(frame)
+                frames.append(label)
+                frame = frame.f_back
+            if ident not in thread_labels:
+                thread_labels = _thread_labels(loop_thread_id)
+            frames.append(thread_labels.get(ident, f"thread-{ident}"))
+            stacks[";".join(reversed(frames))] += 1
+        # Frames keep their locals alive
+        frame = frames_by_thread = None
+        next_tick += interval
+        delay = next_tick - time.perf_counter()
+        if delay > 0:
+            stop.wait(delay)
+        else:
+            next_tick = time.perf_counter()
+
+
+async def profile(seconds: float, mode: str = "busy",
+                  interval: float = DEFAULT_INTERVAL,
+                  thread_id: Optional[int] = None) -> ProfileResult:
+    """Profile all threads (or only thread_id) for the given seconds.
+
+    Raises ValueError on bad arguments and ProfilerBusy if a profile is
+    already running.
+    """
+    if mode not in MODES:
+        raise ValueError(f"Unknown profiling mode: {mode}")
+    if not 0 < seconds <= MAX_SECONDS:
+        raise ValueError(f"Duration must be between 0 and {MAX_SECONDS} seconds")
+    if not _running.acquire(blocking=False):
+        raise ProfilerBusy("Another profile is already running")
+
+    try:
+        stacks: Counter = Counter()
+        counts = [0, 0]
+        stop = threading.Event()
+        sampler = threading.Thread(
+            target=_sample,
+            args=(threading.get_ident(), thread_id, mode, interval, stop, stacks, counts),
+            name="profiler",
+            daemon=True,
+        )
+        sampler.start()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            stop.set()
+            await asyncio.to_thread(sampler.join)
+        return ProfileResult(mode, seconds, interval, stacks, counts[0], counts[1])
+    finally:
+        _running.release()
+
+
+def format_summary(result: ProfileResult, limit: int = 15) -> str:
+    """Short plain-text summary with the top functions by self time."""
+    busy = result.samples - result.idle
+    lines = [
+        f"Профиль {result.mode}, {result.seconds:g} с: {result.samples} сэмплов"
+        + (f", из них {busy} с нагрузкой" if result.mode == "busy" else ""),
+        "",
+    ]
+    for entry in result.top_functions(limit):
+        lines.append(
+            f"{entry['self_pct']:5.1f}% ({entry['total_pct']:5.1f}%) {entry['function']}"
+        )
+    return "\n".join(lines)
@@ -0,0 +1,210 @@
+"""Recording of raw incoming updates for offline replay.
+
+Updates are appended as JSON lines ({"t": unix time, "update": {...}}) to
+gzip segment files that rotate by update count and age. Every write is a
+complete gzip member, so a segment stays readable even if the process dies
+mid-way; gzip readers see the members as one stream.
+
+With anonymization, ids and names of human users and private chats are
+replaced by stable keyed hashes, so one person maps to the same fake id
+across a recording. Bots and configured operators are kept as is, so
+replays still recognise bot replies and operator commands.
+"""
+
+import gzip
+import hashlib
+import hmac
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Anonymized ids start here, above any real Telegram user id seen so far
+ANON_ID_BASE = 10 ** 12
+
+
+class Anonymizer:
+    """Replace user identities in update payloads with keyed hashes."""
+
+    def __init__(self, salt: bytes, keep_ids=()):
+        """Initialize with a secret salt and ids that must not change."""
+        self.salt = salt
+        self.keep_ids = set(keep_ids)
+
+    def user_id(self, user_id: int) -> int:
+        digest = hmac.new(self.salt, str(user_id).encode(), hashlib.sha256).digest()
+        return ANON_ID_BASE + int.from_bytes(digest[:5], "big")
+
+    def _identity(self, obj: Dict[str, Any]) -> None:
+        original = obj["id"]
+        if original in self.keep_ids:
+            return
+        fake = self.user_id(original)
+        obj["id"] = fake
+        if "username" in obj:
+            obj["username"] = f"user{fake}"
+        if "first_name" in obj:
+            obj["first_name"] = f"User {fake}"
+        obj.pop("last_name", None)
+
+    def apply(self, value: Any) -> Any:
+        """Anonymize a decoded update in place and return it."""
+        if isinstance(value, dict):
+            is_user = "is_bot" in value and not value["is_bot"]
+            is_private_chat = value.get("type") == "private" and "id" in value
+            if is_user or is_private_chat:
+                self._identity(value)
+            for item in value.values():
+                if isinstance(item, (dict, list)):
+                    self.apply(item)
+        elif isinstance(value, list):
+            for item in value:
+                if isinstance(item, (dict, list)):
+                    self.apply(item)
+        return value
+
+
+class UpdateRecorder:
+    """Append raw updates to rotating gzip segments."""
+
+    def __init__(self, directory: str, segment_updates: int = 10000,
+                 segment_seconds: float = 3600, anonymizer: Optional[Anonymizer] = None):
+        """Initialize recorder writing into directory."""
+        self.directory = directory
+        self.segment_updates = segment_updates
+        self.segment_seconds = segment_seconds
+        self.anonymizer = anonymizer
+        self._lock = threading.Lock()
+        self._path: Optional[str] = None
+        self._opened_at = 0.0
+        self._written = 0
+        self._segments = 0
+        self._queue: Optional[queue.SimpleQueue] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def _segment_path(self) -> str:
+        now = time.time()
+        if (
+            self._path is None
+            or self._written >= self.segment_updates
+            or now - self._opened_at >= self.segment_seconds
+        ):
+            os.makedirs(self.directory, exist_ok=True)
+            stamp = datetime.fromtimestamp(now).strftime("%Y%m%d-%H%M%S")
+            self._segments += 1
+            self._path = os.path.join(
+                self.directory,
+                f"updates-{stamp}-{os.getpid()}-{self._segments:04d}.jsonl.gz",
+            )
+            self._opened_at = now
+            self._written = 0
+        return self._path
+
+    def _encode(self, received_at: float, update: Any) -> str:
+        if not isinstance(update, dict):
+            # aiogram Update queued by the polling middleware
+            update = update.model_dump(mode="json", by_alias=True, exclude_none=True)
+        elif self.anonymizer:
+            update = json.loads(json.dumps(update))
+        if self.anonymizer:
+            update = self.anonymizer.apply(update)
+        return json.dumps({"t": received_at, "update": update}, ensure_ascii=False) + "\n"
+
+    def write(self, updates: List[Dict[str, Any]], received_at: float = None) -> None:
+        """Write updates synchronously as one gzip member."""
+        received_at = received_at or time.time()
+        self._write_lines([self._encode(received_at, update) for update in updates])
+
+    def _write_lines(self, lines: List[str]) -> None:
+        with self._lock:
+            while lines:
+                path = self._segment_path()
+                batch = lines[:self.segment_updates - self._written]
+                lines = lines[len(batch):]
+                with gzip.open(path, "at", encoding="utf-8") as f:
+                    f.writelines(batch)
+                self._written += len(batch)
+
+    def record(self, update: Any) -> None:
+        """Queue an update (dict or aiogram Update) for the background writer.
+
+        Serialization, anonymization and compression all happen on the
+        writer thread.
+        """
+        if self._thread is None:
+            self._queue = queue.SimpleQueue()
+            self._thread = threading.Thread(target=self._run, name="update-recorder", daemon=True)
+            self._thread.start()
+        self._queue.put((time.time(), update))
+
+    def _run(self) -> None:
+        while True:
+            items = [self._queue.get()]
+            while True:
+                try:
+                    items.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = items[-1] is None
+            try:
+                self._write_lines([self._encode(*item) for item in items if item is not None])
+            except Exception as e:
+                logger.error("Failed to record %d updates: %s", len(items), e)
+            if stop:
+                return
+
+    def close(self) -> None:
+        """Flush queued updates and stop the writer thread."""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+
+def read_segments(paths: List[str]) -> Iterator[Dict[str, Any]]:
+    """Yield recorded entries from segment files or directories, oldest first.
+
+    A segment cut off by a crash yields the lines before the damage.
+    """
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(
+                os.path.join(path, name) for name in os.listdir(path)
+                if name.endswith(".jsonl.gz")
+            )
+        else:
+            files.append(path)
+
+    for path in sorted(files, key=os.path.basename):
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        yield json.loads(line)
+        except (EOFError, gzip.BadGzipFile, json.JSONDecodeError) as e:
+            logger.warning("Segment %s is truncated or damaged: %s", path, e)
+
+
+def create_recorder() -> Optional[UpdateRecorder]:
+    """Build the recorder from Config, or None when recording is off."""
+    if not Config.RECORD_UPDATES:
+        return None
+    anonymizer = None
+    if Config.RECORD_ANONYMIZE:
+        salt = Config.RECORD_SALT.encode() if Config.RECORD_SALT else os.urandom(16)
+        anonymizer = Anonymizer(salt, keep_ids=Config.OPERATOR_IDS)
+    return UpdateRecorder(
+        Config.RECORD_DIR,
+        segment_updates=Config.RECORD_SEGMENT_UPDATES,
+        segment_seconds=Config.RECORD_SEGMENT_SECONDS,
+        anonymizer=anonymizer,
+    )
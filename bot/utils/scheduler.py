@@ -1,21 +1,50 @@
-"""Scheduler module for automated task sending."""
+"""Scheduler module for automated task sending.
 
+Every bot process may run the scheduler, but only the holder of the
+scheduler lease (the leader) runs its jobs. Each scheduled run is also
+claimed in the job_runs table under its slot, so a run that is triggered
+twice, by two processes or by a repeated cron delivery, happens once.
+
+Jobs are rebuilt from the configuration on start, and job_runs is what
+persists: when a process becomes the leader, and every
+SCHEDULER_RUN_TIMEOUT_SECONDS while it leads, it catches up on runs missed
+within SCHEDULER_MISFIRE_GRACE_SECONDS (only the latest one per job if
+SCHEDULER_COALESCE is on).
+"""
+
+import asyncio
 import logging
+import os
 import random
 import json
-from datetime import datetime
-from typing import List, Dict
+import socket
+import time
+import uuid
+from datetime import datetime, time as dtime, timedelta
+from typing import Awaitable, Callable, List, Dict, Optional
 from aiogram import Bot
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.interval import IntervalTrigger
 
 from database import Database
 from config import Config
+from bot.utils.delivery import deliver
+from bot.utils.metrics import track_job
 
 logger = logging.getLogger(__name__)
 
 db = Database()
 
+# Identifies this process as a lease holder
+INSTANCE_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+LEADER_LEASE = "scheduler"
+
+_is_leader = False
+_catch_up_run: Optional[asyncio.Task] = None
+# time.monotonic() of the latest catch-up start
+_caught_up_at = 0.0
+
 
 def load_tasks() -> List[Dict]:
     """Load tasks from tasks.json file."""
@@ -26,7 +55,7 @@ def load_tasks() -> List[Dict]:
         logger.error("tasks.json not found!")
         return []
     except json.JSONDecodeError as e:
-        logger.error(f"Error parsing tasks.json: {e}")
+        logger.error("Error parsing tasks.json: %s", e)
         return []
 
 
@@ -49,18 +78,30 @@ def initialize_tasks():
                 content_type=task_data["content_type"],
                 points=task_data["points"]
             )
-        logger.info(f"Loaded {len(tasks_data)} tasks into database")
+        logger.info("Loaded %d tasks into database", len(tasks_data))
     else:
-        logger.info(f"Database already contains {len(existing_tasks)} tasks")
+        logger.info("Database already contains %d tasks", len(existing_tasks))
 
 
-async def send_random_task(bot: Bot):
-    """Send a random task to the chat."""
-    tasks = db.get_active_tasks()
+def _send_kwargs(chat_id: int, text: str) -> Dict:
+    """Message arguments targeting the chat's Flood topic, if it has one."""
+    send_kwargs = {
+        "chat_id": chat_id,
+        "text": text,
+    }
+    thread_id = Config.CHATS[chat_id]["flood_thread_id"]
+    if thread_id > 0:
+        send_kwargs["message_thread_id"] = thread_id
+    return send_kwargs
+
+
+@track_job("send_task")
+async def send_random_task(bot: Bot, chat_id: int):
+    """Send a random task to a chat."""
+    tasks = await db.aio.get_active_tasks()
 
     if not tasks:
-        logger.error("No active tasks available")
-        return
+        raise RuntimeError("No active tasks available")
 
     # Select random task
     task = random.choice(tasks)
@@ -70,13 +111,6 @@ async def send_random_task(bot: Bot):
     week_number = now.isocalendar()[1]
     year = now.year
 
-    # Record daily task
-    daily_task_id = db.add_daily_task(
-        task_id=task["task_id"],
-        week_number=week_number,
-        year=year
-    )
-
     # Prepare task message
     content_type_emoji = {
         "text": "📝",
@@ -95,23 +129,28 @@ async def send_random_task(bot: Bot):
         f"Ответьте на это сообщение, чтобы выполнить задание!"
     )
 
-    send_kwargs = {
-        "chat_id": Config.CHAT_ID,
-        "text": message_text,
-    }
-    if Config.FLOOD_THREAD_ID > 0:
-        send_kwargs["message_thread_id"] = Config.FLOOD_THREAD_ID
-
     try:
-        await bot.send_message(**send_kwargs)
-        logger.info(f"Task {task['task_id']} sent successfully (daily_task_id: {daily_task_id})")
+        await bot.send_message(**_send_kwargs(chat_id, message_text))
     except Exception as e:
-        logger.error(f"Failed to send task: {e}")
+        logger.error("Failed to send task to chat %s: %s", chat_id, e)
+        raise
+
+    # Recorded only once sent: a recorded task is what catch-up counts as
+    # the slot being served
+    daily_task_id = await db.aio.add_daily_task(
+        chat_id=chat_id,
+        task_id=task["task_id"],
+        week_number=week_number,
+        year=year
+    )
+    logger.info("Task %s sent to chat %s (daily_task_id: %s)",
+                task["task_id"], chat_id, daily_task_id)
 
 
-async def send_week_results(bot: Bot):
-    """Send week results and determine winners."""
-    leaderboard = db.get_leaderboard(limit=10)
+@track_job("week_results")
+async def send_week_results(bot: Bot, chat_id: int, week_number: int = None, year: int = None):
+    """Send week results of a chat and determine winners (current week by default)."""
+    leaderboard = await db.aio.get_leaderboard(chat_id, week_number, year, limit=10)
 
     if not leaderboard:
         message = "🏆 Итоги недели\n\nВ эту неделю не было активных участников."
@@ -139,46 +178,299 @@ async def send_week_results(bot: Bot):
 
         message += "\n🎉 Поздравляем победителей!\n\nСпасибо всем за участие!"
 
-    send_kwargs = {
-        "chat_id": Config.CHAT_ID,
-        "text": message,
-    }
-    if Config.FLOOD_THREAD_ID > 0:
-        send_kwargs["message_thread_id"] = Config.FLOOD_THREAD_ID
+    try:
+        await bot.send_message(**_send_kwargs(chat_id, message))
+        logger.info("Week results sent to chat %s", chat_id)
+    except Exception as e:
+        logger.error("Failed to send week results to chat %s: %s", chat_id, e)
+        raise
+
+
+def _week_summary_text(summary: Dict, week_number: int) -> str:
+    return (
+        f"📬 Твои итоги {week_number}-й недели\n\n"
+        f"💰 Баллы: {summary['total_points']}\n"
+        f"🏆 Место: {summary['rank']} из {summary['participants']}\n"
+        f"✅ Принятых ответов на задания: {summary['approved_answers']}\n"
+        f"💬 Баллы за активность в чате: {summary['activity_points']}\n\n"
+        f"Спасибо за участие!"
+    )
+
+
+def queue_week_summaries(chat_id: int, week_number: int, year: int) -> int:
+    """Queue a private summary of the week for every participant of a chat."""
+    summaries = db.get_week_summaries(chat_id, week_number, year)
+    queued = db.enqueue_messages(
+        f"week_summary:{chat_id}:{year}-W{week_number:02d}",
+        [(summary["user_id"], _week_summary_text(summary, week_number)) for summary in summaries],
+    )
+    logger.info("Queued %d week summaries for chat %s", queued, chat_id)
+    return queued
+
+
+@track_job("week_rollover")
+async def rollover_week(closed: Optional[datetime] = None):
+    """Reset weekly warnings and bans at the start of a new week.
+
+    closed is a moment of the week that ended, yesterday by default.
+    """
+    closed = closed or datetime.now() - timedelta(days=1)
+    week_number = closed.isocalendar()[1]
+    year = closed.year
+
+    try:
+        reset_count = await db.aio.reset_weekly_moderation(week_number, year)
+        logger.info("Week %s/%s rolled over, %s users reset", week_number, year, reset_count)
+    except Exception as e:
+        logger.error("Failed to roll over week: %s", e)
+        raise
+
+
+def _parse_time(time_str: str) -> dtime:
+    hour, minute = map(int, time_str.split(":"))
+    return dtime(hour, minute)
+
+
+def due_slots(times: List[str], now: datetime, window: float,
+              weekday: Optional[int] = None) -> List[datetime]:
+    """Scheduled moments in the last window seconds up to now, oldest first.
+
+    times are "HH:MM" strings, run daily or only on weekday (0=Monday).
+    """
+    start = now - timedelta(seconds=window)
+    slots = []
+    day = start.date()
+    while day <= now.date():
+        if weekday is None or day.weekday() == weekday:
+            for time_str in times:
+                slot = datetime.combine(day, _parse_time(time_str))
+                if start <= slot <= now:
+                    slots.append(slot)
+        day += timedelta(days=1)
+    return sorted(slots)
+
+
+def task_run_key(chat_id: int, now: Optional[datetime] = None) -> str:
+    """Slot a task run belongs to: the chat's latest task time not after now."""
+    now = now or datetime.now()
+    slots = due_slots(Config.CHATS[chat_id]["task_times"], now, 86400)
+    slot = slots[-1] if slots else now
+    return slot.strftime("%Y-%m-%dT%H:%M")
+
+
+def week_run_key(when: Optional[datetime] = None) -> str:
+    """Slot of a weekly run: the ISO week of when."""
+    year, week_number, _ = (when or datetime.now()).isocalendar()
+    return f"{year}-W{week_number:02d}"
+
+
+async def run_once(job: str, run_key: str, func: Callable[..., Awaitable], *args) -> bool:
+    """Run func unless this run of job was already claimed.
+
+    Returns whether func ran. A run that raised is recorded as failed and
+    may be retried, as may one left running for
+    SCHEDULER_RUN_TIMEOUT_SECONDS by a process that died.
+    """
+    if not await db.aio.claim_job_run(
+        job, run_key, INSTANCE_ID, Config.SCHEDULER_RUN_TIMEOUT_SECONDS
+    ):
+        logger.info("Job %s for %s already ran, skipping", job, run_key)
+        return False
+    status = "failed"
+    try:
+        await func(*args)
+        status = "done"
+    finally:
+        await db.aio.finish_job_run(job, run_key, status)
+    return True
+
+
+async def send_task_once(bot: Bot, chat_id: int, slot: Optional[datetime] = None) -> bool:
+    """Send the chat's task for a slot (the current one by default) unless it was sent."""
+    return await run_once(f"send_task:{chat_id}", task_run_key(chat_id, slot),
+                          send_random_task, bot, chat_id)
+
+
+async def send_week_results_once(bot: Bot, chat_id: int,
+                                 slot: Optional[datetime] = None) -> bool:
+    """Close the chat's week of slot (now by default) unless it was closed.
+
+    Posting the results and queueing personal summaries are claimed as
+    separate runs, so retrying a week whose summaries failed to queue
+    does not post the results to the chat again. Returns whether either ran.
+    """
+    slot = slot or datetime.now()
+    week_number, year = slot.isocalendar()[1], slot.year
+    run_key = week_run_key(slot)
+    posted = await run_once(f"week_results:{chat_id}", run_key,
+                            send_week_results, bot, chat_id, week_number, year)
+    if not Config.WEEK_SUMMARY_DMS:
+        return posted
+    # Seconds of work for tens of thousands of participants, so in a thread
+    queued = await run_once(f"week_summaries:{chat_id}", run_key, asyncio.to_thread,
+                            queue_week_summaries, chat_id, week_number, year)
+    return posted or queued
+
+
+async def rollover_week_once(slot: Optional[datetime] = None) -> bool:
+    """Roll over the week that ended before slot (now by default) unless it was rolled over."""
+    closed = (slot or datetime.now()) - timedelta(days=1)
+    return await run_once("week_rollover", week_run_key(closed), rollover_week, closed)
+
 
+def _latest_if_coalesced(slots: List[datetime]) -> List[datetime]:
+    return slots[-1:] if Config.SCHEDULER_COALESCE else slots
+
+
+async def catch_up_missed_runs(bot: Bot) -> None:
+    """Run jobs whose slots passed within the misfire grace time without a run.
+
+    Only the latest slot of each job is looked at, plus earlier ones when
+    coalescing is off, so this costs a few indexed lookups, not a scan.
+    """
+    now = datetime.now()
+    grace = Config.SCHEDULER_MISFIRE_GRACE_SECONDS
+    rollover_day = (Config.WEEK_END_DAY + 1) % 7
+    for chat_id, chat in Config.CHATS.items():
+        for slot in _latest_if_coalesced(due_slots(chat["task_times"], now, grace)):
+            await _catch_up(_catch_up_send_task, bot, chat_id, slot)
+        week_ends = due_slots([chat["week_end_time"]], now, grace, chat["week_end_day"])
+        for slot in _latest_if_coalesced(week_ends):
+            await _catch_up(send_week_results_once, bot, chat_id, slot)
+    for slot in _latest_if_coalesced(due_slots(["00:00"], now, grace, rollover_day)):
+        await _catch_up(rollover_week_once, slot)
+
+
+async def _catch_up_send_task(bot: Bot, chat_id: int, slot: datetime) -> None:
+    # A task sent after the slot (also by /send_task, or before job_runs
+    # existed) covers it
+    if not await db.aio.has_daily_task_since(chat_id, slot):
+        logger.info("Catching up task for chat %s due at %s", chat_id, slot)
+        await send_task_once(bot, chat_id, slot)
+
+
+async def _catch_up(func: Callable[..., Awaitable], *args) -> None:
+    """Run one missed run; a failure is logged and the other runs still go."""
     try:
-        await bot.send_message(**send_kwargs)
-        logger.info("Week results sent successfully")
+        await func(*args)
+    except Exception as e:
+        logger.error("Failed to catch up %s: %s", func.__name__, e)
+
+
+async def renew_leadership() -> bool:
+    """Take or renew the scheduler lease; True while this process leads."""
+    global _is_leader
+    try:
+        leader = await db.aio.acquire_lease(
+            LEADER_LEASE, INSTANCE_ID, Config.SCHEDULER_LEASE_SECONDS
+        )
     except Exception as e:
-        logger.error(f"Failed to send week results: {e}")
+        logger.error("Failed to renew scheduler lease: %s", e)
+        leader = False
+    if leader != _is_leader:
+        if leader:
+            logger.info("Scheduler lease acquired by %s", INSTANCE_ID)
+        else:
+            logger.info("Scheduler lease lost by %s", INSTANCE_ID)
+        _is_leader = leader
+    return leader
+
+
+async def leader_heartbeat(bot: Bot) -> None:
+    """Renew the lease and, while leading, catch up on missed runs.
+
+    Catch-up runs on becoming the leader and again every
+    SCHEDULER_RUN_TIMEOUT_SECONDS after, when runs that a dead process
+    left running can be claimed.
+    """
+    global _catch_up_run, _caught_up_at
+    was_leader = _is_leader
+    if not await renew_leadership():
+        return
+    if _catch_up_run is not None and not _catch_up_run.done():
+        return
+    now = time.monotonic()
+    if was_leader and now - _caught_up_at < Config.SCHEDULER_RUN_TIMEOUT_SECONDS:
+        return
+    _caught_up_at = now
+    # In the background, so slow sends never delay the next renewal
+    _catch_up_run = asyncio.create_task(catch_up_missed_runs(bot))
+
+
+async def _as_leader(func: Callable[..., Awaitable], *args) -> None:
+    """Scheduled job body: run func only in the leader process."""
+    if not await renew_leadership():
+        logger.debug("Not the scheduler leader, skipping %s", func.__name__)
+        return
+    await func(*args)
 
 
 def setup_scheduler(bot: Bot) -> AsyncIOScheduler:
     """Setup and configure the scheduler."""
-    scheduler = AsyncIOScheduler()
+    # A job that fires late (busy event loop) still runs within the grace
+    # time, and several late firings of one job run once
+    scheduler = AsyncIOScheduler(job_defaults={
+        "misfire_grace_time": int(Config.SCHEDULER_MISFIRE_GRACE_SECONDS),
+        "coalesce": Config.SCHEDULER_COALESCE,
+    })
+
+    for chat_id, chat in Config.CHATS.items():
+        # Schedule tasks sending
+        for time_str in chat["task_times"]:
+            hour, minute = map(int, time_str.split(":"))
+            scheduler.add_job(
+                _as_leader,
+                CronTrigger(hour=hour, minute=minute),
+                args=[send_task_once, bot, chat_id],
+                id=f"task_{chat_id}_{time_str}",
+                replace_existing=True
+            )
+            logger.info("Scheduled task sending to chat %s at %s", chat_id, time_str)
 
-    # Schedule tasks sending
-    for time_str in Config.TASK_SCHEDULE_TIMES:
-        hour, minute = map(int, time_str.split(":"))
+        # Schedule week end results
+        week_end_hour, week_end_minute = map(int, chat["week_end_time"].split(":"))
         scheduler.add_job(
-            send_random_task,
-            CronTrigger(hour=hour, minute=minute),
-            args=[bot],
-            id=f"task_{time_str}",
+            _as_leader,
+            CronTrigger(day_of_week=chat["week_end_day"], hour=week_end_hour, minute=week_end_minute),
+            args=[send_week_results_once, bot, chat_id],
+            id=f"week_end_{chat_id}",
             replace_existing=True
         )
-        logger.info(f"Scheduled task sending at {time_str}")
+        logger.info(
+            "Scheduled week end results for chat %s on day %s at %s",
+            chat_id, chat["week_end_day"], chat["week_end_time"]
+        )
+
+    # Warnings and bans are shared by all chats, so the moderation reset
+    # runs once, at midnight after the global week end
+    scheduler.add_job(
+        _as_leader,
+        CronTrigger(day_of_week=(Config.WEEK_END_DAY + 1) % 7, hour=0, minute=0),
+        args=[rollover_week_once],
+        id="week_rollover",
+        replace_existing=True
+    )
+    logger.info("Scheduled week rollover on day %s at 00:00", (Config.WEEK_END_DAY + 1) % 7)
 
-    # Schedule week end results
-    week_end_hour, week_end_minute = map(int, Config.WEEK_END_TIME.split(":"))
+    # Queued private messages; a tick during a delivery returns at once
     scheduler.add_job(
-        send_week_results,
-        CronTrigger(day_of_week=Config.WEEK_END_DAY, hour=week_end_hour, minute=week_end_minute),
+        _as_leader,
+        IntervalTrigger(seconds=Config.DM_POLL_SECONDS),
+        args=[deliver, bot],
+        id="deliver_outbox",
+        max_instances=2,
+        replace_existing=True
+    )
+
+    # Heartbeat: hold the lease while alive, take it over when the leader dies
+    scheduler.add_job(
+        leader_heartbeat,
+        IntervalTrigger(seconds=Config.SCHEDULER_HEARTBEAT_SECONDS),
         args=[bot],
-        id="week_end",
+        id="leader_heartbeat",
+        next_run_time=datetime.now(),
         replace_existing=True
     )
-    logger.info(f"Scheduled week end results on day {Config.WEEK_END_DAY} at {Config.WEEK_END_TIME}")
 
     return scheduler
 
@@ -194,3 +486,13 @@ async def start_scheduler(bot: Bot):
     logger.info("Scheduler started successfully")
 
     return scheduler
+
+
+def stop_scheduler(scheduler: AsyncIOScheduler) -> None:
+    """Stop scheduling and hand the lease over to another process."""
+    global _is_leader
+    scheduler.shutdown(wait=False)
+    if _is_leader:
+        db.release_lease(LEADER_LEASE, INSTANCE_ID)
+        _is_leader = False
+        logger.info("Scheduler lease released by %s", INSTANCE_ID)
@@ -0,0 +1,213 @@
+"""Live score changes for server-sent event (SSE) streams.
+
+A ScoreFeed follows the points log instead of hooking into add_points, so
+streaming never slows a write and sees points added by any process. Every
+SSE_FRAME_SECONDS, while anyone is subscribed, it reads the points rows
+added since the previous frame, sums them per user and publishes one frame
+per chat with each changed user's delta, new weekly total and new rank;
+a burst of points costs one frame and one rank lookup per user.
+
+Row IDs are not a safe cursor on PostgreSQL: a transaction can commit a
+row after rows with higher IDs were read. So each poll reads again from
+the newest row seen lag seconds ago and skips the rows it published.
+
+Each subscriber buffers at most SSE_BUFFER_FRAMES frames. A subscriber
+that falls that far behind is dropped and its stream ends after the
+buffered frames. Frames carry the ID of the newest points row they cover,
+so a client that reconnects with Last-Event-ID gets what it missed.
+"""
+
+import asyncio
+import json
+import logging
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional, Set, Tuple
+
+from database import Database
+
+logger = logging.getLogger(__name__)
+
+# Catch-up after a reconnect reads at most this many points rows; clients
+# further behind are told to reload the leaderboard
+RESUME_MAX_ROWS = 10000
+
+
+def format_event(event: str, data: dict, event_id: int = None) -> bytes:
+    """Encode one SSE message."""
+    lines = [] if event_id is None else [f"id: {event_id}"]
+    lines.append(f"event: {event}")
+    lines.append("data: " + json.dumps(data, ensure_ascii=False, separators=(",", ":")))
+    return ("\n".join(lines) + "\n\n").encode()
+
+
+def _sum_changes(rows: List[Dict]) -> List[Dict]:
+    """Sum points rows per chat, user and week, like Database.get_score_changes."""
+    changes: Dict[tuple, Dict] = {}
+    for row in rows:
+        key = (row["chat_id"], row["user_id"], row["week_number"], row["year"])
+        change = changes.get(key)
+        if change is None:
+            change = changes[key] = {
+                "chat_id": row["chat_id"],
+                "user_id": row["user_id"],
+                "week_number": row["week_number"],
+                "year": row["year"],
+                "delta": 0,
+                "last_id": row["point_id"],
+            }
+        change["delta"] += row["points"]
+        change["last_id"] = max(change["last_id"], row["point_id"])
+    return sorted(changes.values(), key=lambda change: change["last_id"])
+
+
+class Subscriber:
+    """One stream's bounded queue of encoded frames."""
+
+    def __init__(self, chat_id: int, since: int, buffer_size: int):
+        self.chat_id = chat_id
+        # Frames cover points rows after since
+        self.since = since
+        self.queue: asyncio.Queue = asyncio.Queue(buffer_size)
+        self.dropped = False
+
+
+class ScoreFeed:
+    """Publishes coalesced score changes to subscribers, per chat."""
+
+    def __init__(self, db: Database, interval: float, buffer_size: int, lag: float = 0):
+        self.db = db
+        self.interval = interval
+        self.buffer_size = buffer_size
+        self.lag = lag
+        self.subscribers: Dict[int, Set[Subscriber]] = {}
+        # Newest points row published; None while nobody is subscribed
+        self.last_id: Optional[int] = None
+        # (time.monotonic(), last_id) of recent polls; the first is the
+        # newest at least lag seconds old, where the next poll reads from
+        self._marks: Deque[Tuple[float, int]] = deque()
+        # IDs of published rows after the first mark
+        self._published: Set[int] = set()
+        self._task: Optional[asyncio.Task] = None
+        # Held by a poll, so a new subscriber starts exactly between frames
+        self._lock = asyncio.Lock()
+
+    async def subscribe(self, chat_id: int) -> Subscriber:
+        """Start receiving the chat's frames."""
+        async with self._lock:
+            if self.last_id is None:
+                self.last_id = await asyncio.to_thread(self.db.get_last_point_id)
+                self._marks.append((time.monotonic(), self.last_id))
+            subscriber = Subscriber(chat_id, self.last_id, self.buffer_size)
+            self.subscribers.setdefault(chat_id, set()).add(subscriber)
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        """Stop sending frames to subscriber."""
+        chat_subscribers = self.subscribers.get(subscriber.chat_id)
+        if chat_subscribers is not None:
+            chat_subscribers.discard(subscriber)
+            if not chat_subscribers:
+                del self.subscribers[subscriber.chat_id]
+
+    async def catch_up(self, chat_id: int, after_id: int, up_to_id: int) -> Optional[List[bytes]]:
+        """Frames of the chat's changes between two points rows.
+
+        Returns None if that is more than RESUME_MAX_ROWS rows.
+        """
+        if after_id >= up_to_id:
+            return []
+        if up_to_id - after_id > RESUME_MAX_ROWS:
+            return None
+        changes = await asyncio.to_thread(self.db.get_score_changes, after_id, up_to_id)
+        frames = await asyncio.to_thread(
+            self._render, [change for change in changes if change["chat_id"] == chat_id]
+        )
+        return [frame for _, frame in frames]
+
+    async def _run(self) -> None:
+        try:
+            while self.subscribers:
+                await asyncio.sleep(self.interval)
+                try:
+                    await self.poll()
+                except Exception as e:
+                    logger.warning("Score feed update failed: %s", e)
+        finally:
+            self._task = None
+            if not self.subscribers:
+                # The next subscriber starts from the rows of its own time
+                self.last_id = None
+                self._marks.clear()
+                self._published.clear()
+
+    async def poll(self) -> None:
+        """Publish the changes since the previous frame."""
+        async with self._lock:
+            now = time.monotonic()
+            while len(self._marks) > 1 and self._marks[1][0] <= now - self.lag:
+                self._marks.popleft()
+            floor = self._marks[0][1] if self._marks else self.last_id
+            self._published = {point_id for point_id in self._published if point_id > floor}
+
+            rows = await asyncio.to_thread(self.db.get_points_after, floor)
+            rows = [row for row in rows if row["point_id"] not in self._published]
+            if rows:
+                self.last_id = max(self.last_id, rows[-1]["point_id"])
+                watched = [row for row in rows if row["chat_id"] in self.subscribers]
+                frames = await asyncio.to_thread(
+                    self._render, _sum_changes(watched), self.last_id
+                )
+                for chat_id, frame in frames:
+                    self._publish(chat_id, frame)
+                self._published.update(row["point_id"] for row in rows)
+            self._marks.append((now, self.last_id))
+
+    def _render(self, changes: List[Dict], event_id: int = None) -> List[tuple]:
+        """Encode (chat ID, frame) pairs for changes, one frame per chat and week.
+
+        Frames carry event_id, or else the newest row of their chat.
+        """
+        groups: Dict[tuple, List[Dict]] = {}
+        for change in changes:
+            key = (change["chat_id"], change["week_number"], change["year"])
+            groups.setdefault(key, []).append(change)
+        # All frames of a chat carry its newest row, so resuming from any
+        # of them never replays another
+        newest: Dict[int, int] = {}
+        for change in changes:
+            newest[change["chat_id"]] = (
+                event_id or max(newest.get(change["chat_id"], 0), change["last_id"])
+            )
+
+        frames = []
+        for (chat_id, week_number, year), group in groups.items():
+            ranks = self.db.get_user_ranks(
+                chat_id, [change["user_id"] for change in group], week_number, year
+            )
+            users = []
+            for change in group:
+                score = ranks.get(change["user_id"], {"total_points": 0, "rank": None})
+                users.append({
+                    "user_id": change["user_id"],
+                    "delta": change["delta"],
+                    "total_points": score["total_points"],
+                    "rank": score["rank"],
+                })
+            frames.append((chat_id, format_event(
+                "scores",
+                {"chat_id": chat_id, "week": week_number, "year": year, "changes": users},
+                newest[chat_id],
+            )))
+        return frames
+
+    def _publish(self, chat_id: int, frame: bytes) -> None:
+        for subscriber in list(self.subscribers.get(chat_id, ())):
+            try:
+                subscriber.queue.put_nowait(frame)
+            except asyncio.QueueFull:
+                subscriber.dropped = True
+                self.unsubscribe(subscriber)
+                logger.info("Dropped a slow score stream of chat %s", chat_id)
@@ -0,0 +1,154 @@
+"""Per-user sliding-window spam detection for the Flood thread.
+
+Each user gets fixed-size ring buffers holding the time, "short" flag and
+text hash of their most recent messages, plus running state over the
+windows the rules look at: the number of short messages and, per text
+hash, the times it was sent. Recording a message and evaluating every rule
+is O(1): one slot is overwritten and the entries entering and leaving the
+windows are added and removed.
+
+Rules, all limited to messages sent within `window` seconds:
+- rate: `max_messages` messages;
+- short messages: at least `short_ratio` of the last `short_count`
+  messages are shorter than `short_length`;
+- repeats: the same normalized text `repeat_limit` times among the last
+  `repeat_count` messages, the oldest of those repeats within the window.
+
+Users are kept in an OrderedDict by last activity, so idle users are
+evicted from the front in amortized O(1).
+"""
+
+import time
+from collections import OrderedDict, deque
+from typing import Deque, Dict, List, Optional
+
+
+class _UserWindow:
+    """Recent messages of one user."""
+
+    __slots__ = ("times", "short", "hashes", "seen", "short_total", "hash_times",
+                 "last_at", "cooldown_until")
+
+    def __init__(self, capacity: int):
+        self.times: List[float] = [0.0] * capacity
+        self.short: List[bool] = [False] * capacity
+        self.hashes: List[Optional[int]] = [None] * capacity
+        self.seen = 0
+        self.short_total = 0
+        # Send times, oldest first, of each text among the last repeat_count
+        self.hash_times: Dict[int, Deque[float]] = {}
+        self.last_at = 0.0
+        self.cooldown_until = 0.0
+
+
+class SpamDetector:
+    """Flag users whose recent messages cross rate, short or repeat limits."""
+
+    def __init__(self, window: float = 60, max_messages: int = 20,
+                 short_length: int = 10, short_count: int = 12, short_ratio: float = 0.9,
+                 repeat_count: int = 10, repeat_limit: int = 5,
+                 cooldown: float = 600, idle_timeout: float = 600):
+        """Initialize detector thresholds."""
+        self.window = window
+        self.max_messages = max_messages
+        self.short_length = short_length
+        self.short_count = short_count
+        self.short_ratio = short_ratio
+        self.repeat_count = repeat_count
+        self.repeat_limit = repeat_limit
+        self.cooldown = cooldown
+        self.idle_timeout = max(idle_timeout, window, cooldown)
+        self.capacity = max(max_messages, short_count, repeat_count)
+        self._users: "OrderedDict[int, _UserWindow]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._users)
+
+    @staticmethod
+    def _normalize(text: str) -> int:
+        return hash(" ".join(text.lower().split()))
+
+    def _evict(self, now: float) -> None:
+        users = self._users
+        while users:
+            user_id, state = next(iter(users.items()))
+            if now - state.last_at < self.idle_timeout:
+                break
+            del users[user_id]
+
+    def _time_back(self, state: _UserWindow, messages: int) -> float:
+        """Time of the message `messages - 1` before the latest one."""
+        return state.times[(state.seen - messages) % self.capacity]
+
+    def check(self, user_id: int, text: Optional[str], now: float = None) -> Optional[str]:
+        """Record a message and return the broken rule, if any.
+
+        text is None for media without a caption; it counts towards the
+        rate but is neither short nor a repeat. After a hit the user's
+        history is cleared and no further hits are reported until the
+        cooldown passes.
+        """
+        now = time.monotonic() if now is None else now
+        self._evict(now)
+
+        state = self._users.get(user_id)
+        if state is None:
+            state = self._users[user_id] = _UserWindow(self.capacity)
+        else:
+            self._users.move_to_end(user_id)
+        state.last_at = now
+
+        # Entries leaving the short and repeat windows
+        seen = state.seen
+        if seen >= self.short_count and state.short[(seen - self.short_count) % self.capacity]:
+            state.short_total -= 1
+        if seen >= self.repeat_count:
+            old = state.hashes[(seen - self.repeat_count) % self.capacity]
+            if old is not None:
+                # The leaving message is the oldest send of its text
+                old_times = state.hash_times[old]
+                old_times.popleft()
+                if not old_times:
+                    del state.hash_times[old]
+
+        slot = seen % self.capacity
+        is_short = text is not None and len(text.strip()) < self.short_length
+        text_hash = self._normalize(text) if text else None
+        state.times[slot] = now
+        state.short[slot] = is_short
+        state.hashes[slot] = text_hash
+        state.seen = seen = seen + 1
+        if is_short:
+            state.short_total += 1
+        repeats = None
+        if text_hash is not None:
+            repeats = state.hash_times.get(text_hash)
+            if repeats is None:
+                repeats = state.hash_times[text_hash] = deque()
+            repeats.append(now)
+
+        if now < state.cooldown_until:
+            return None
+
+        reason = None
+        if seen >= self.max_messages and now - self._time_back(state, self.max_messages) <= self.window:
+            reason = "rate"
+        elif (
+            seen >= self.short_count
+            and state.short_total >= self.short_ratio * self.short_count
+            and now - self._time_back(state, self.short_count) <= self.window
+        ):
+            reason = "short"
+        elif (
+            repeats is not None
+            and len(repeats) >= self.repeat_limit
+            and now - repeats[-self.repeat_limit] <= self.window
+        ):
+            reason = "repeat"
+
+        if reason:
+            fresh = _UserWindow(self.capacity)
+            fresh.last_at = now
+            fresh.cooldown_until = now + self.cooldown
+            self._users[user_id] = fresh
+        return reason
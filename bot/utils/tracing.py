@@ -0,0 +1,156 @@
+"""Per-update trace records written to a rotating JSON lines file.
+
+A trace is started by TracingMiddleware for each update reaching a router
+and lives in a context variable, so database and Bot API timings from
+anywhere inside the handler add up on the right update even when updates
+are processed concurrently. Only a sample of records is written, plus every
+failed or slow update.
+"""
+
+import json
+import logging
+import os
+import random
+import threading
+import time
+from contextvars import ContextVar
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+from typing import Any, Dict, Optional
+
+import database
+from bot.utils.logs import queue_handler
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+_trace_logger: Optional[logging.Logger] = None
+# Set when the trace file could not be opened, so that is logged once
+_trace_file_error: Optional[Exception] = None
+# Database timings arrive from executor threads on PostgreSQL, possibly
+# several at once for one update
+_db_time_lock = threading.Lock()
+
+
+class Trace:
+    """Timings collected while one update is handled."""
+
+    __slots__ = (
+        "router", "update_id", "update_type", "user_id", "chat_id", "handler",
+        "start", "db_ms", "db_calls", "api_ms", "api_calls",
+    )
+
+    def __init__(self, router: str, update_id: Optional[int], update_type: str,
+                 user_id: Optional[int], chat_id: Optional[int]):
+        """Start timing an update."""
+        self.router = router
+        self.update_id = update_id
+        self.update_type = update_type
+        self.user_id = user_id
+        self.chat_id = chat_id
+        self.handler: Optional[str] = None
+        self.start = time.perf_counter()
+        self.db_ms = 0.0
+        self.db_calls = 0
+        self.api_ms = 0.0
+        self.api_calls = 0
+
+    def to_record(self, outcome: str, wall_ms: float, error: Optional[str]) -> Dict[str, Any]:
+        """Build the JSON record for the trace file."""
+        record = {
+            "ts": datetime.now().isoformat(timespec="milliseconds"),
+            "update_id": self.update_id,
+            "update_type": self.update_type,
+            "router": self.router,
+            "handler": self.handler,
+            "outcome": outcome,
+            "wall_ms": round(wall_ms, 3),
+            "db_ms": round(self.db_ms, 3),
+            "db_calls": self.db_calls,
+            "api_ms": round(self.api_ms, 3),
+            "api_calls": self.api_calls,
+            "user_id": self.user_id,
+            "chat_id": self.chat_id,
+        }
+        if error:
+            record["error"] = error
+        return record
+
+
+current_trace: ContextVar[Optional[Trace]] = ContextVar("current_trace", default=None)
+
+
+def set_handler(name: str) -> None:
+    """Remember which handler the current update was routed to."""
+    trace = current_trace.get()
+    if trace is not None:
+        trace.handler = name
+
+
+def add_api_time(elapsed_ms: float) -> None:
+    """Add one Bot API call to the current trace."""
+    trace = current_trace.get()
+    if trace is not None:
+        trace.api_ms += elapsed_ms
+        trace.api_calls += 1
+
+
+def _add_db_time(method: str, elapsed_ms: float) -> None:
+    trace = current_trace.get()
+    if trace is not None:
+        with _db_time_lock:
+            trace.db_ms += elapsed_ms
+            trace.db_calls += 1
+
+
+database.connection_listeners.append(_add_db_time)
+
+
+def should_record(outcome: str, wall_ms: float) -> bool:
+    """Keep all failed and slow updates and a random sample of the rest."""
+    if outcome == "error" or wall_ms >= Config.TRACE_SLOW_MS:
+        return True
+    return random.random() < Config.TRACE_SAMPLE_RATE
+
+
+def _get_trace_logger() -> logging.Logger:
+    global _trace_logger
+    if _trace_logger is None:
+        trace_logger = logging.getLogger("bot.trace")
+        trace_logger.propagate = False
+        trace_logger.setLevel(logging.INFO)
+        directory = os.path.dirname(Config.TRACE_FILE)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        handler = RotatingFileHandler(
+            Config.TRACE_FILE,
+            maxBytes=Config.TRACE_MAX_BYTES,
+            backupCount=Config.TRACE_BACKUP_COUNT,
+            encoding="utf-8",
+        )
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        trace_logger.addHandler(queue_handler(handler))
+        _trace_logger = trace_logger
+    return _trace_logger
+
+
+def write_record(record: Dict[str, Any]) -> None:
+    """Append one trace record to the trace file.
+
+    If the file cannot be opened, tracing stops writing records until the
+    process restarts and the error is logged once.
+    """
+    global _trace_file_error
+    if _trace_file_error is not None:
+        return
+    try:
+        trace_logger = _get_trace_logger()
+    except Exception as e:
+        _trace_file_error = e
+        logger.error("Cannot open trace file %s, trace records are dropped: %s",
+                     Config.TRACE_FILE, e)
+        return
+    try:
+        trace_logger.info(json.dumps(record, ensure_ascii=False))
+    except Exception as e:
+        logger.error("Failed to write trace record: %s", e)
@@ -0,0 +1,143 @@
+"""Known-user cache and target resolution for operator commands.
+
+Only this process's own writes are cached: the last profile synced per
+user and their home chat. Usernames change hands and are updated by every
+replica, so target lookups always go to the database, where sync_user
+keeps each username on its latest owner only.
+"""
+
+import logging
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+from aiogram.types import Message, User
+
+from database import Database
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+db = Database()
+
+# Users kept in each cache; the least recently seen are evicted first
+MAX_CACHED_USERS = 50000
+
+# Last profile written to the database per user ID
+_profiles: "OrderedDict[int, Tuple]" = OrderedDict()
+# User ID -> configured chat the user was last seen in
+_home_chats: "OrderedDict[int, int]" = OrderedDict()
+
+
+def _cache(store: OrderedDict, key, value) -> None:
+    """Store value as the most recent entry, evicting the oldest past the limit."""
+    store[key] = value
+    store.move_to_end(key)
+    if len(store) > MAX_CACHED_USERS:
+        store.popitem(last=False)
+
+
+async def remember_user(user: User, chat_id: Optional[int] = None) -> None:
+    """Keep the users table current, touching the DB only on changes.
+
+    chat_id is the configured group the update came from, if any; it
+    becomes the user's home chat.
+    """
+    profile = (
+        user.username,
+        user.first_name,
+        user.last_name,
+        user.id in Config.OPERATOR_IDS,
+    )
+    if _profiles.get(user.id) == profile and (
+        chat_id is None or _home_chats.get(user.id) == chat_id
+    ):
+        _profiles.move_to_end(user.id)
+        return
+
+    await db.aio.sync_user(user.id, *profile, chat_id=chat_id)
+
+    _cache(_profiles, user.id, profile)
+    if chat_id is not None:
+        _cache(_home_chats, user.id, chat_id)
+
+
+async def home_chat_id(user_id: int) -> int:
+    """Chat whose scores a user sees in private: their home chat or the default."""
+    chat_id = _home_chats.get(user_id)
+    if chat_id is None:
+        user = await db.aio.get_user(user_id)
+        if user and user["chat_id"] in Config.CHATS:
+            chat_id = user["chat_id"]
+            _cache(_home_chats, user_id, chat_id)
+    return chat_id if chat_id in Config.CHATS else Config.CHAT_ID
+
+
+async def resolve_username(username: str) -> Optional[int]:
+    """Get user ID for a username, with or without leading @.
+
+    Read from the database, since the username may have moved to another
+    user since this process last saw either of them.
+    """
+    key = username.lstrip("@").lower()
+    if not key:
+        return None
+    return await db.aio.get_user_id_by_username(key)
+
+
+async def resolve_target(message: Message, args: str = "") -> Tuple[Optional[int], str, str]:
+    """Resolve the user an operator command is aimed at.
+
+    The target is the first argument (@username or numeric ID) or, failing
+    that, the sender of the replied-to message. Returns the user ID (None if
+    not found), a display label and the remaining argument text.
+    """
+    parts = args.split(maxsplit=1)
+    first = parts[0] if parts else ""
+    rest = parts[1] if len(parts) > 1 else ""
+
+    if first.startswith("@"):
+        return await resolve_username(first), first, rest
+    if first.isdigit():
+        return int(first), first, rest
+
+    # The member who posted the replied-to message, also when it is a
+    # forward: the original author may not even be in the chat
+    reply = message.reply_to_message
+    if reply:
+        author = reply.from_user
+        if author and not author.is_bot:
+            label = f"@{author.username}" if author.username else str(author.id)
+            return author.id, label, args.strip()
+
+    return None, first, rest
+
+
+async def resolve_targets(args: str) -> Tuple[List[int], List[str], str]:
+    """Resolve a leading list of @usernames and IDs for bulk commands.
+
+    Returns resolved user IDs, targets that could not be found and the
+    remaining text after the list.
+    """
+    tokens = args.split()
+    targets = []
+    for token in tokens:
+        if not (token.startswith("@") or token.isdigit()):
+            break
+        targets.append(token)
+    rest = " ".join(tokens[len(targets):])
+
+    usernames = [t.lstrip("@").lower() for t in targets if t.startswith("@")]
+    found = await db.aio.get_user_ids_by_usernames(usernames) if usernames else {}
+
+    user_ids = []
+    unresolved = []
+    for target in targets:
+        if target.isdigit():
+            user_ids.append(int(target))
+            continue
+        user_id = found.get(target.lstrip("@").lower())
+        if user_id is None:
+            unresolved.append(target)
+        else:
+            user_ids.append(user_id)
+
+    return user_ids, unresolved, rest
@@ -10,18 +10,16 @@ from aiogram.enums import ParseMode
 from config import Config
 from database import Database
 from bot.handlers import user, operator
-from bot.utils.scheduler import start_scheduler
+from bot.middlewares import setup_middlewares
+from bot.middlewares.recorder import UpdateRecorderMiddleware
+from bot.utils.logs import setup_logging
+from bot.utils.metrics import start_metrics_server
+from bot.utils.recorder import create_recorder
+from bot.utils.scheduler import start_scheduler, stop_scheduler
 
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    handlers=[
-        logging.StreamHandler(sys.stdout),
-        logging.FileHandler("bot.log", encoding="utf-8")
-    ]
-)
+# Configure logging (queued, written by a background thread)
+setup_logging()
 
 logger = logging.getLogger(__name__)
 
@@ -44,6 +42,14 @@ async def main():
 
         dp = Dispatcher()
 
+        # Record raw updates for offline replay (opt-in), in arrival order
+        recorder = create_recorder()
+        if recorder:
+            dp.update.outer_middleware(UpdateRecorderMiddleware(recorder))
+            logger.info("Recording updates to %s", Config.RECORD_DIR)
+
+        setup_middlewares(dp, bot)
+
         # Register routers
         dp.include_router(user.router)
         dp.include_router(operator.router)
@@ -51,14 +57,24 @@ async def main():
         logger.info("Routers registered")
 
         # Start scheduler
-        await start_scheduler(bot)
+        scheduler = await start_scheduler(bot)
+
+        # Expose /metrics for scraping
+        if Config.METRICS_PORT:
+            await start_metrics_server(Config.METRICS_PORT, Config.METRICS_HOST,
+                                       Config.METRICS_TOKEN)
 
         # Start polling
         logger.info("Bot started successfully!")
-        await dp.start_polling(bot)
+        try:
+            await dp.start_polling(bot)
+        finally:
+            stop_scheduler(scheduler)
+            if recorder:
+                recorder.close()
 
     except Exception as e:
-        logger.error(f"Error starting bot: {e}")
+        logger.error("Error starting bot: %s", e)
         raise
 
 
@@ -68,5 +84,5 @@ if __name__ == "__main__":
     except KeyboardInterrupt:
         logger.info("Bot stopped by user")
     except Exception as e:
-        logger.error(f"Fatal error: {e}")
+        logger.error("Fatal error: %s", e)
         sys.exit(1)
\ No newline at end of file
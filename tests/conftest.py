@@ -0,0 +1,69 @@
+"""Shared test setup.
+
+config validates itself on import and every bot module opens the default
+database at import time, so placeholder settings and a throwaway
+DATABASE_URL are set before any test module imports them.
+
+Tests using the db fixture run on both storage engines: SQLite, and
+PostgreSQL from TEST_DATABASE_URL or, without it, a server started in
+process by pgserver (pip install -r requirements-dev.txt). Each test gets
+a database of its own.
+"""
+
+import os
+import tempfile
+import uuid
+from urllib.parse import urlsplit, urlunsplit
+
+os.environ.setdefault("BOT_TOKEN", "123456:TEST-token")
+os.environ.setdefault("CHAT_ID", "-1001000000000")
+os.environ.setdefault("OPERATOR_IDS", "1")
+os.environ.setdefault(
+    "DATABASE_URL", "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="chatquest-"), "bot.db")
+)
+
+import pytest  # noqa: E402
+
+from database import Database, close_engine  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def postgres_url() -> str:
+    """URL of a PostgreSQL server the tests may create databases on."""
+    url = os.getenv("TEST_DATABASE_URL")
+    if url:
+        return url
+    try:
+        import pgserver
+    except ImportError:
+        pytest.skip("PostgreSQL tests need TEST_DATABASE_URL or pgserver")
+    server = pgserver.get_server(tempfile.mkdtemp(prefix="chatquest-pg-"), cleanup_mode="stop")
+    return server.get_uri()
+
+
+def _with_database(url: str, name: str) -> str:
+    parts = urlsplit(url)
+    return urlunsplit(parts._replace(path=f"/{name}"))
+
+
+@pytest.fixture
+def postgres_database(postgres_url):
+    """URL of a new, empty PostgreSQL database, dropped after the test."""
+    import psycopg
+
+    name = f"test_{uuid.uuid4().hex[:12]}"
+    with psycopg.connect(postgres_url, autocommit=True) as conn:
+        conn.execute(f"CREATE DATABASE {name}")
+    url = _with_database(postgres_url, name)
+    yield url
+    close_engine(url)
+    with psycopg.connect(postgres_url, autocommit=True) as conn:
+        conn.execute(f"DROP DATABASE IF EXISTS {name}")
+
+
+@pytest.fixture(params=["sqlite", "postgresql"])
+def db(request, tmp_path) -> Database:
+    """Empty database of its own, on each storage engine in turn."""
+    if request.param == "sqlite":
+        return Database(str(tmp_path / "bot.db"))
+    return Database(request.getfixturevalue("postgres_database"))
@@ -0,0 +1,237 @@
+"""Storage contract: every test runs against SQLite and PostgreSQL."""
+
+import asyncio
+from datetime import datetime, timedelta
+
+from database import SYSTEM_ISSUER_ID
+
+CHAT = -1001
+OTHER_CHAT = -1002
+
+
+def this_week():
+    now = datetime.now()
+    return now.isocalendar()[1], now.year
+
+
+def seed_users(db, *user_ids):
+    for user_id in user_ids:
+        db.sync_user(user_id, f"user{user_id}", f"User {user_id}", chat_id=CHAT)
+
+
+def test_engine_kind(db):
+    assert db.engine.dialect in ("sqlite", "postgresql")
+
+
+def test_sync_user_writes_only_changes(db):
+    assert db.sync_user(1, "alice", "Alice", chat_id=CHAT)
+    assert not db.sync_user(1, "alice", "Alice")
+    assert db.sync_user(1, "alice", "Alicia")
+    user = db.get_user(1)
+    assert (user["username"], user["first_name"], user["chat_id"]) == ("alice", "Alicia", CHAT)
+
+
+def test_usernames_are_case_insensitive_and_move_to_latest_owner(db):
+    db.sync_user(1, "Alice", "Alice")
+    assert db.get_user_id_by_username("ALICE") == 1
+    db.sync_user(2, "alice", "Other")
+    assert db.get_user_id_by_username("alice") == 2
+    assert db.get_user(1)["username"] is None
+    assert db.get_user_ids_by_usernames(["ALICE", "nobody"]) == {"alice": 2}
+
+
+def test_points_leaderboard_and_ranks(db):
+    seed_users(db, 1, 2, 3)
+    db.add_points(CHAT, 1, 50, "chat_activity")
+    db.add_points(CHAT, 2, 100, "task")
+    db.add_points(CHAT, 3, 50, "task")
+    db.add_points(OTHER_CHAT, 3, 500, "task")
+    week, year = this_week()
+
+    board = db.get_leaderboard(CHAT)
+    # Ties are in no particular order
+    assert [row["total_points"] for row in board] == [100, 50, 50]
+    assert board[0]["user_id"] == 2
+    assert {row["user_id"] for row in board[1:]} == {1, 3}
+    assert db.get_user_points(CHAT, 3) == 50
+    assert db.get_user_rank(CHAT, 1)["rank"] == 2
+    assert db.get_user_rank(CHAT, 3)["rank"] == 2
+    ranks = db.get_user_ranks(CHAT, [1, 2, 3, 4], week, year)
+    assert {user_id: rank["rank"] for user_id, rank in ranks.items()} == {1: 2, 2: 1, 3: 2}
+    assert db.get_user_rank(CHAT, 99) is None
+
+
+def test_banned_users_leave_the_leaderboard(db):
+    seed_users(db, 1, 2)
+    db.add_points(CHAT, 1, 10, "task")
+    db.add_points(CHAT, 2, 20, "task")
+    version = db.get_score_version(CHAT)
+    assert db.set_banned([2], True) == [2]
+    assert db.set_banned([2], True) == []
+    assert db.get_score_version(CHAT) != version
+    assert [row["user_id"] for row in db.get_leaderboard(CHAT)] == [1]
+    assert db.get_user_rank(CHAT, 2)["rank"] is None
+    assert db.get_user_rank(CHAT, 1)["rank"] == 1
+
+
+def test_weekly_scores_match_points_after_rebuild(db):
+    seed_users(db, 1)
+    db.add_points(CHAT, 1, 10, "task")
+    db.add_points(CHAT, 1, 5, "chat_activity")
+    db.rebuild_weekly_scores()
+    assert db.get_leaderboard(CHAT)[0]["total_points"] == 15
+
+
+def test_chat_activity_accumulates_per_day(db):
+    seed_users(db, 1)
+    db.update_chat_activity(CHAT, 1, 10, 10)
+    db.update_chat_activity(CHAT, 1, 5, 5)
+    assert db.get_daily_activity_points(CHAT, 1) == 15
+    assert db.get_daily_activity_points(OTHER_CHAT, 1) == 0
+
+
+def test_daily_tasks_and_answers(db):
+    seed_users(db, 1, 2)
+    task_id = db.add_task("Say hi", "text", 100)
+    week, year = this_week()
+    daily_task_id = db.add_daily_task(CHAT, task_id, week, year)
+    current = db.get_current_daily_task(CHAT)
+    assert (current["id"], current["text"], current["points"]) == (daily_task_id, "Say hi", 100)
+    assert db.get_current_daily_task(OTHER_CHAT) is None
+    assert db.has_daily_task_since(CHAT, datetime.now() - timedelta(minutes=5))
+
+    first = db.submit_answer(1, daily_task_id, 10, "text", "hi", fingerprint="hi")
+    assert first["status"] == "accepted"
+    assert db.submit_answer(1, daily_task_id, 11, "text", "again")["status"] == "answered"
+    duplicate = db.submit_answer(2, daily_task_id, 12, "text", "hi", fingerprint="hi")
+    assert (duplicate["status"], duplicate["user_id"]) == ("duplicate", 1)
+    assert db.count_pending_answers() == 1
+
+    assert db.update_answer_status(first["answer_id"], "approved", 1)
+    assert not db.update_answer_status(first["answer_id"], "rejected", 1)
+    answer = db.get_answer(first["answer_id"])
+    assert (answer["status"], answer["chat_id"]) == ("approved", CHAT)
+
+
+def test_search_finds_answers_by_word(db):
+    seed_users(db, 1)
+    task_id = db.add_task("Расскажи о себе", "text", 100)
+    week, year = this_week()
+    daily_task_id = db.add_daily_task(CHAT, task_id, week, year)
+    db.submit_answer(1, daily_task_id, 10, "text", "Люблю горные походы")
+    hits = db.search_answers("походы")
+    assert [hit["user_id"] for hit in hits] == [1]
+    assert db.search_answers("плавание") == []
+
+
+def test_warnings_ban_at_limit_and_reset_weekly(db):
+    seed_users(db, 1, 2)
+    assert db.add_warning(1, 2, "spam", max_warnings=2) == {
+        "warnings_count": 1, "is_banned": False
+    }
+    assert db.add_warnings([1, 99], 2, "spam", max_warnings=2) == {
+        1: {"warnings_count": 2, "is_banned": True}
+    }
+    assert len(db.get_user_warnings(1)) == 2
+    week, year = this_week()
+    assert db.reset_weekly_moderation(week, year) == 1
+    assert not db.is_user_banned(1)
+    assert db.get_user(1)["warnings_count"] == 0
+
+
+def test_references_to_missing_users_are_accepted(db):
+    # Neither engine enforces foreign keys: the SQLite schema declares them
+    # but never turns enforcement on, and the PostgreSQL schema omits them.
+    seed_users(db, 1)
+    assert db.add_warning(1, SYSTEM_ISSUER_ID, "spam")["warnings_count"] == 1
+    assert db.get_user(SYSTEM_ISSUER_ID) is None
+    db.add_points(CHAT, 404, 10, "task")
+    assert db.get_user_points(CHAT, 404) == 10
+    # Scores of unknown users stay off the leaderboard, which joins users
+    assert [row["user_id"] for row in db.get_leaderboard(CHAT)] == []
+
+
+def test_score_changes_follow_the_points_log(db):
+    seed_users(db, 1, 2)
+    start = db.get_last_point_id()
+    db.add_points(CHAT, 1, 10, "task")
+    db.add_points(CHAT, 1, 5, "task")
+    db.add_points(CHAT, 2, 7, "task")
+    changes = db.get_score_changes(start)
+    assert {(change["user_id"], change["delta"]) for change in changes} == {(1, 15), (2, 7)}
+    assert max(change["last_id"] for change in changes) == db.get_last_point_id()
+    assert db.get_score_changes(db.get_last_point_id()) == []
+
+
+def test_week_summaries(db):
+    seed_users(db, 1, 2)
+    db.add_points(CHAT, 1, 30, "chat_activity")
+    db.add_points(CHAT, 2, 10, "task")
+    week, year = this_week()
+    summaries = db.get_week_summaries(CHAT, week, year)
+    assert [(row["user_id"], row["rank"], row["participants"], row["activity_points"])
+            for row in summaries] == [(1, 1, 2, 30), (2, 2, 2, 0)]
+
+
+def test_leases(db):
+    assert db.acquire_lease("scheduler", "a", 30)
+    assert not db.acquire_lease("scheduler", "b", 30)
+    assert db.acquire_lease("scheduler", "a", 30)
+    db.release_lease("scheduler", "a")
+    assert db.acquire_lease("scheduler", "b", 30)
+    assert db.acquire_lease("expiring", "a", -1)
+    assert db.acquire_lease("expiring", "b", 30)
+
+
+def test_job_runs_are_claimed_once_and_failed_runs_again(db):
+    assert db.claim_job_run("send_task", "slot", "a", 60)
+    assert not db.claim_job_run("send_task", "slot", "b", 60)
+    db.finish_job_run("send_task", "slot", "failed")
+    assert db.claim_job_run("send_task", "slot", "b", 60)
+    db.finish_job_run("send_task", "slot", "done")
+    assert not db.claim_job_run("send_task", "slot", "c", 60)
+
+
+def test_stale_running_job_runs_are_taken_over(db):
+    assert db.claim_job_run("send_task", "slot", "a", 60)
+    assert not db.claim_job_run("send_task", "slot", "b", 60)
+    assert db.claim_job_run("send_task", "slot", "b", -1)
+    db.finish_job_run("send_task", "slot", "done")
+    assert not db.claim_job_run("send_task", "slot", "c", -1)
+
+
+def test_outbox_campaign_lifecycle(db):
+    seed_users(db, 1, 2, 3)
+    assert db.enqueue_all_users("broadcast:1", "hello") == 3
+    assert db.enqueue_messages("broadcast:1", [(1, "hello"), (4, "hello")]) == 1
+    assert db.pause_campaign("broadcast:1") == 4
+    assert db.claim_messages(10, 300, 3) == []
+    assert db.resume_campaign("broadcast:1") == 4
+
+    claimed = db.claim_messages(2, 300, 3)
+    assert [row["user_id"] for row in claimed] == [1, 2]
+    assert all(row["attempts"] == 1 for row in claimed)
+    db.finish_message(claimed[0]["id"], "sent")
+    db.release_messages([claimed[1]["id"]])
+    assert db.cancel_campaign("broadcast:1") == 3
+    assert db.get_campaign_stats("broadcast:1") == {"sent": 1, "cancelled": 3}
+
+
+def test_async_calls_reach_the_same_database(db):
+    async def scenario():
+        await db.aio.sync_user(1, "alice", "Alice", chat_id=CHAT)
+        await db.aio.add_points(CHAT, 1, 10, "task")
+        return await db.aio.get_user_points(CHAT, 1)
+
+    assert asyncio.run(scenario()) == 10
+    assert db.get_user_points(CHAT, 1) == 10
+
+
+def test_outbox_requeues_stale_claims_until_attempts_run_out(db):
+    seed_users(db, 1)
+    db.enqueue_messages("broadcast:1", [(1, "hello")])
+    # Claimed by senders that died (stale_after -1: every claim is stale)
+    assert [row["attempts"] for row in db.claim_messages(10, -1, 2)] == [1]
+    assert [row["attempts"] for row in db.claim_messages(10, -1, 2)] == [2]
+    assert db.claim_messages(10, -1, 2) == []
+    assert db.get_campaign_stats("broadcast:1") == {"failed": 1}
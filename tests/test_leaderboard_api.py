@@ -0,0 +1,53 @@
+"""JSON leaderboard API: snapshots, ETags and their caches."""
+
+import asyncio
+
+import pytest
+
+from api import leaderboard as api
+from config import Config
+
+CHAT = Config.CHAT_ID
+
+
+@pytest.fixture
+def db(db, monkeypatch):
+    monkeypatch.setattr(api, "db", db)
+    api.snapshots.invalidate()
+    api.user_snapshots.invalidate()
+    db.sync_user(1, "alice", "Alice", chat_id=CHAT)
+    db.add_points(CHAT, 1, 10, "task")
+    return db
+
+
+def get(if_none_match=None, accept_encoding=None):
+    return asyncio.run(api.leaderboard(
+        chat_id=CHAT, week=None, year=None, limit=10,
+        if_none_match=if_none_match, accept_encoding=accept_encoding,
+    ))
+
+
+def test_encodings_have_their_own_etags(db):
+    plain = get()
+    gzipped = get(accept_encoding="gzip, deflate")
+    assert gzipped.headers["Content-Encoding"] == "gzip"
+    assert plain.headers["ETag"] != gzipped.headers["ETag"]
+
+    assert get(if_none_match=plain.headers["ETag"]).status_code == 304
+    assert get(if_none_match=gzipped.headers["ETag"], accept_encoding="gzip").status_code == 304
+    # A validator of the other encoding is not a match
+    assert get(if_none_match=plain.headers["ETag"], accept_encoding="gzip").status_code == 200
+    assert get(if_none_match=gzipped.headers["ETag"]).status_code == 200
+
+
+def test_snapshots_are_dropped_with_each_ttl_bucket(db, monkeypatch):
+    for week in range(1, 6):
+        asyncio.run(api.leaderboard(
+            chat_id=CHAT, week=week, year=2020, limit=10,
+            if_none_match=None, accept_encoding=None,
+        ))
+    assert len(api.snapshots._values) == 5
+
+    monkeypatch.setattr(api, "_bucket", lambda: api._snapshots_bucket + 1)
+    get()
+    assert len(api.snapshots._values) == 1
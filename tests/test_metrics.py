@@ -0,0 +1,72 @@
+"""Metrics collection and exposition."""
+
+import asyncio
+import threading
+
+import pytest
+
+from bot.utils import metrics
+from database import QueryStats
+
+
+def test_query_stats_count_every_statement_across_threads():
+    stats = QueryStats()
+
+    def record():
+        for _ in range(2000):
+            stats.record("get_user", 1.5)
+
+    threads = [threading.Thread(target=record) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    entry = stats.snapshot()["get_user"]
+    assert entry["count"] == 16000
+    assert sum(entry["buckets"].values()) == 16000
+    assert entry["total_ms"] == 24000
+
+
+def test_gauge_is_refreshed_before_rendering():
+    calls = []
+
+    async def load():
+        calls.append(1)
+        return 7
+
+    gauge = metrics.Gauge("test_loaded", "Loaded at scrape time", callback=load)
+    try:
+        assert "test_loaded 0.0" in metrics.render()
+        assert "test_loaded 7" in asyncio.run(metrics.collect())
+        assert len(calls) == 1
+    finally:
+        metrics._registry.remove(gauge)
+
+
+def test_gauge_whose_refresh_failed_is_left_out():
+    async def load():
+        raise RuntimeError("database is down")
+
+    gauge = metrics.Gauge("test_failing", "Fails at scrape time", callback=load)
+    try:
+        assert "test_failing" not in asyncio.run(metrics.collect())
+    finally:
+        metrics._registry.remove(gauge)
+
+
+def test_serverless_metrics_need_the_token(monkeypatch):
+    from fastapi import HTTPException
+
+    from api._app import check_metrics_auth
+    from config import Config
+
+    monkeypatch.setattr(Config, "METRICS_TOKEN", "")
+    with pytest.raises(HTTPException) as error:
+        check_metrics_auth(None)
+    assert error.value.status_code == 404
+
+    monkeypatch.setattr(Config, "METRICS_TOKEN", "secret")
+    with pytest.raises(HTTPException) as error:
+        check_metrics_auth("Bearer wrong")
+    assert error.value.status_code == 401
+    check_metrics_auth("Bearer secret")
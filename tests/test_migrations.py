@@ -0,0 +1,117 @@
+"""Upgrades of databases created by earlier releases."""
+
+import sqlite3
+
+from config import Config
+from database import Database
+
+# Schema of the first release, before multi-chat support
+LEGACY_SCHEMA = """
+CREATE TABLE users (
+    user_id INTEGER PRIMARY KEY,
+    username TEXT,
+    first_name TEXT,
+    last_name TEXT,
+    is_operator BOOLEAN DEFAULT 0,
+    is_banned BOOLEAN DEFAULT 0,
+    warnings_count INTEGER DEFAULT 0,
+    joined_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE tasks (
+    task_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    text TEXT NOT NULL,
+    content_type TEXT NOT NULL,
+    points INTEGER NOT NULL,
+    is_active BOOLEAN DEFAULT 1,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE daily_tasks (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    task_id INTEGER NOT NULL,
+    sent_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    week_number INTEGER NOT NULL,
+    year INTEGER NOT NULL
+);
+CREATE TABLE answers (
+    answer_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    daily_task_id INTEGER NOT NULL,
+    message_id INTEGER NOT NULL,
+    content_type TEXT NOT NULL,
+    content TEXT,
+    status TEXT DEFAULT 'pending',
+    reviewed_by INTEGER,
+    answered_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    reviewed_at TIMESTAMP
+);
+CREATE TABLE points (
+    point_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    points INTEGER NOT NULL,
+    reason TEXT NOT NULL,
+    reference_id INTEGER,
+    week_number INTEGER NOT NULL,
+    year INTEGER NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE chat_activity (
+    activity_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    date DATE NOT NULL,
+    messages_count INTEGER DEFAULT 0,
+    words_count INTEGER DEFAULT 0,
+    points_earned INTEGER DEFAULT 0,
+    UNIQUE(user_id, date)
+);
+CREATE TABLE warnings (
+    warning_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    issued_by INTEGER NOT NULL,
+    reason TEXT,
+    issued_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+INSERT INTO users (user_id, username, first_name) VALUES (10, 'alice', 'Alice');
+INSERT INTO tasks (text, content_type, points) VALUES ('Say hi', 'text', 100);
+INSERT INTO daily_tasks (task_id, week_number, year) VALUES (1, 5, 2024);
+INSERT INTO answers (user_id, daily_task_id, message_id, content_type, content, status)
+VALUES (10, 1, 100, 'text', 'hi', 'approved');
+INSERT INTO points (user_id, points, reason, reference_id, week_number, year)
+VALUES (10, 100, 'task', 1, 5, 2024), (10, 7, 'activity', NULL, 5, 2024);
+INSERT INTO chat_activity (user_id, date, messages_count, words_count, points_earned)
+VALUES (10, '2024-02-01', 3, 7, 7);
+"""
+
+
+def legacy_database(path) -> str:
+    conn = sqlite3.connect(path)
+    conn.executescript(LEGACY_SCHEMA)
+    conn.close()
+    return str(path)
+
+
+def test_legacy_rows_move_to_the_default_chat(tmp_path, monkeypatch):
+    # CHATS without CHAT_ID: an empty CHAT_ID must not break the upgrade,
+    # and history goes to the first configured chat, not to chat 0
+    monkeypatch.setenv("CHAT_ID", "")
+    monkeypatch.setattr(Config, "CHAT_ID", -1002000000000)
+    db = Database(legacy_database(tmp_path / "legacy.db"))
+
+    chat_id = -1002000000000
+    with db.get_connection() as conn:
+        cursor = conn.cursor()
+        for table in ("daily_tasks", "answers", "points", "users", "chat_activity"):
+            cursor.execute(f"SELECT DISTINCT chat_id FROM {table}")
+            assert [row["chat_id"] for row in cursor.fetchall()] == [chat_id], table
+        cursor.execute("SELECT messages_count, points_earned FROM chat_activity")
+        assert tuple(cursor.fetchone()) == (3, 7)
+
+    leaderboard = db.get_leaderboard(chat_id, 5, 2024)
+    assert [(row["user_id"], row["total_points"]) for row in leaderboard] == [(10, 107)]
+    assert db.get_leaderboard(0, 5, 2024) == []
+
+
+def test_upgrade_is_idempotent(tmp_path):
+    path = legacy_database(tmp_path / "legacy.db")
+    Database(path)
+    db = Database(path)
+    assert db.get_user_points(Config.CHAT_ID, 10, 5, 2024) == 107
@@ -0,0 +1,48 @@
+"""Sampling profiler."""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from bot.utils import profiler
+
+
+def spin(seconds: float) -> int:
+    total = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        total += 1
+    return total
+
+
+def test_busy_profile_covers_executor_threads_and_skips_idle_ones():
+    async def scenario():
+        with ThreadPoolExecutor(2, thread_name_prefix="bot-db") as executor:
+            loop = asyncio.get_running_loop()
+            # One worker spins, the other waits for work
+            executor.submit(time.sleep, 0)
+            work = loop.run_in_executor(executor, spin, 0.4)
+            result = await profiler.profile(0.3, "busy", interval=0.002)
+            await work
+        return result
+
+    result = asyncio.run(scenario())
+    threads = {stack.split(";", 1)[0] for stack in result.stacks}
+    assert any(thread.startswith("bot-db") for thread in threads)
+    assert any("spin (test_profiler.py" in stack for stack in result.stacks)
+    # The waiting worker and the event loop sleeping in its selector
+    assert result.idle > 0
+    innermost = {stack.rsplit(";", 1)[-1].split(":")[0] for stack in result.stacks}
+    assert not innermost & {"_worker (thread.py", "select (selectors.py"}
+
+
+def test_wall_profile_of_one_thread_counts_every_sample():
+    async def scenario():
+        return await profiler.profile(0.1, "wall", interval=0.002,
+                                      thread_id=threading.get_ident())
+
+    result = asyncio.run(scenario())
+    assert result.idle == 0
+    assert result.samples == sum(result.stacks.values())
+    assert all(stack.startswith("event-loop;") for stack in result.stacks)
@@ -0,0 +1,111 @@
+"""Scheduled runs: claiming, recording and catching up."""
+
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from bot.utils import scheduler
+from config import Config
+
+CHAT = Config.CHAT_ID
+
+
+class FakeBot:
+    """Records sent messages, or fails every send."""
+
+    def __init__(self, fail: bool = False):
+        self.fail = fail
+        self.sent = []
+
+    async def send_message(self, **kwargs):
+        if self.fail:
+            raise RuntimeError("Telegram is unavailable")
+        self.sent.append(kwargs)
+
+
+@pytest.fixture
+def db(db, monkeypatch):
+    monkeypatch.setattr(scheduler, "db", db)
+    db.add_task("Say hi", "text", 100)
+    return db
+
+
+def test_failed_send_leaves_the_slot_unserved(db):
+    slot = datetime.now() - timedelta(minutes=1)
+    with pytest.raises(RuntimeError):
+        asyncio.run(scheduler.send_task_once(FakeBot(fail=True), CHAT, slot))
+    assert not db.has_daily_task_since(CHAT, slot)
+    assert db.get_current_daily_task(CHAT) is None
+
+    bot = FakeBot()
+    assert asyncio.run(scheduler.send_task_once(bot, CHAT, slot))
+    assert len(bot.sent) == 1
+    assert db.has_daily_task_since(CHAT, slot)
+    assert not asyncio.run(scheduler.send_task_once(bot, CHAT, slot))
+
+
+def test_catch_up_takes_over_a_run_left_running(db, monkeypatch):
+    slot = datetime.now() - timedelta(minutes=1)
+    run_key = scheduler.task_run_key(CHAT, slot)
+    assert db.claim_job_run(f"send_task:{CHAT}", run_key, "dead-process", 60)
+
+    bot = FakeBot()
+    asyncio.run(scheduler._catch_up_send_task(bot, CHAT, slot))
+    assert bot.sent == []
+
+    monkeypatch.setattr(Config, "SCHEDULER_RUN_TIMEOUT_SECONDS", -1)
+    asyncio.run(scheduler._catch_up_send_task(bot, CHAT, slot))
+    assert len(bot.sent) == 1
+
+
+def test_leader_repeats_catch_up_every_run_timeout(db, monkeypatch):
+    monkeypatch.setattr(scheduler, "_is_leader", False)
+    monkeypatch.setattr(scheduler, "_catch_up_run", None)
+    monkeypatch.setattr(scheduler, "_caught_up_at", 0.0)
+    runs = []
+
+    async def catch_up_missed_runs(bot):
+        runs.append(bot)
+
+    monkeypatch.setattr(scheduler, "catch_up_missed_runs", catch_up_missed_runs)
+
+    async def heartbeats(count):
+        for _ in range(count):
+            await scheduler.leader_heartbeat("bot")
+            await asyncio.sleep(0)
+
+    monkeypatch.setattr(Config, "SCHEDULER_RUN_TIMEOUT_SECONDS", 3600)
+    asyncio.run(heartbeats(3))
+    assert len(runs) == 1
+    monkeypatch.setattr(Config, "SCHEDULER_RUN_TIMEOUT_SECONDS", 0)
+    asyncio.run(heartbeats(2))
+    assert len(runs) == 3
+
+
+def test_week_summaries_are_retried_without_posting_results_again(db, monkeypatch):
+    monkeypatch.setattr(Config, "WEEK_SUMMARY_DMS", True)
+    db.sync_user(1, "alice", "Alice", chat_id=CHAT)
+    db.add_points(CHAT, 1, 10, "task")
+    slot = datetime.now()
+    outbox_down = [True]
+    queue_week_summaries = scheduler.queue_week_summaries
+
+    def queue(*args):
+        if outbox_down[0]:
+            raise RuntimeError("outbox is unavailable")
+        return queue_week_summaries(*args)
+
+    monkeypatch.setattr(scheduler, "queue_week_summaries", queue)
+    bot = FakeBot()
+    with pytest.raises(RuntimeError):
+        asyncio.run(scheduler.send_week_results_once(bot, CHAT, slot))
+    assert len(bot.sent) == 1
+
+    outbox_down[0] = False
+    assert asyncio.run(scheduler.send_week_results_once(bot, CHAT, slot))
+    assert len(bot.sent) == 1
+    week_number, year = slot.isocalendar()[1], slot.year
+    campaign = f"week_summary:{CHAT}:{year}-W{week_number:02d}"
+    assert db.get_campaign_stats(campaign) == {"pending": 1}
+    assert not asyncio.run(scheduler.send_week_results_once(bot, CHAT, slot))
@@ -0,0 +1,56 @@
+"""Live score feed: frames from the points log."""
+
+import asyncio
+import json
+
+from bot.utils.score_feed import ScoreFeed
+
+CHAT = -1001
+
+
+def frames(subscriber):
+    """Decoded frames waiting in a subscriber's queue."""
+    decoded = []
+    while not subscriber.queue.empty():
+        for line in subscriber.queue.get_nowait().decode().splitlines():
+            if line.startswith("data: "):
+                decoded.append(json.loads(line[len("data: "):]))
+    return decoded
+
+
+def deltas(frame):
+    return {change["user_id"]: change["delta"] for change in frame["changes"]}
+
+
+def test_rows_committed_out_of_id_order_are_published_once(db):
+    for user_id in (1, 2, 3):
+        db.sync_user(user_id, f"user{user_id}", f"User {user_id}", chat_id=CHAT)
+
+    async def scenario():
+        feed = ScoreFeed(db, interval=1, buffer_size=8, lag=60)
+        subscriber = await feed.subscribe(CHAT)
+        for user_id in (1, 2, 3):
+            db.add_points(CHAT, user_id, 10 * user_id, "task")
+        # Row of user 2 is not committed yet when the feed reads
+        late = db.get_points_after(subscriber.since)[1]
+        with db.get_connection() as conn:
+            conn.cursor().execute("DELETE FROM points WHERE point_id = ?", (late["point_id"],))
+        await feed.poll()
+        first = frames(subscriber)
+
+        with db.get_connection() as conn:
+            conn.cursor().execute("""
+                INSERT INTO points (point_id, chat_id, user_id, points, reason, week_number, year)
+                VALUES (?, ?, ?, ?, 'task', ?, ?)
+            """, (late["point_id"], CHAT, 2, late["points"], late["week_number"], late["year"]))
+        await feed.poll()
+        second = frames(subscriber)
+        await feed.poll()
+        third = frames(subscriber)
+        feed.unsubscribe(subscriber)
+        return first, second, third
+
+    first, second, third = asyncio.run(scenario())
+    assert [deltas(frame) for frame in first] == [{1: 10, 3: 30}]
+    assert [deltas(frame) for frame in second] == [{2: 20}]
+    assert third == []
@@ -0,0 +1,73 @@
+"""SQLite full-text search of answers: query building and the FTS5 index."""
+
+from datetime import datetime
+
+import pytest
+
+from database import Database, _fts5_query
+
+CHAT = -1001
+
+
+@pytest.mark.parametrize("text, query", [
+    ("походы", '"походы"*'),
+    ("горные  походы", '"горные"* "походы"*'),
+    ('"горные походы" летом', '"горные походы" "летом"*'),
+    ("NOT походы OR", '"NOT"* "походы"* "OR"*'),
+    ("c++ (test)", '"c++"* "(test)"*'),
+    ('"unclosed phrase', '"unclosed"* "phrase"*'),
+    ('- * ^ ""', ""),
+])
+def test_fts5_query_quotes_every_term(text, query):
+    assert _fts5_query(text) == query
+
+
+@pytest.fixture
+def db(tmp_path) -> Database:
+    db = Database(str(tmp_path / "bot.db"))
+    db.sync_user(1, "alice", "Alice", chat_id=CHAT)
+    return db
+
+
+def execute(db, sql, params=()):
+    with db.get_connection() as conn:
+        conn.cursor().execute(sql, params)
+
+
+def found(db, query):
+    return [hit["answer_id"] for hit in db.search_answers(query)]
+
+
+def test_operator_words_are_searched_as_text(db):
+    task_id = db.add_task("Опиши выходные", "text", 100)
+    now = datetime.now()
+    daily_task_id = db.add_daily_task(CHAT, task_id, now.isocalendar()[1], now.year)
+    answer_id = db.submit_answer(1, daily_task_id, 10, "text", "NOT AND OR NEAR")["answer_id"]
+    assert found(db, "NOT OR") == [answer_id]
+    assert found(db, 'NEAR( "and') == [answer_id]
+
+
+def test_index_follows_answers_and_task_texts(db):
+    task_id = db.add_task("Расскажи о хобби", "text", 100)
+    now = datetime.now()
+    daily_task_id = db.add_daily_task(CHAT, task_id, now.isocalendar()[1], now.year)
+    answer_id = db.submit_answer(1, daily_task_id, 10, "text", "Собираю марки")["answer_id"]
+    assert found(db, "марки") == [answer_id]
+    assert found(db, "хобби") == [answer_id]
+
+    execute(db, "UPDATE answers SET content = ? WHERE answer_id = ?",
+            ("Играю в шахматы", answer_id))
+    assert found(db, "марки") == []
+    assert found(db, "шахмат") == [answer_id]
+
+    execute(db, "UPDATE tasks SET text = ? WHERE task_id = ?", ("Чем ты увлекаешься?", task_id))
+    assert found(db, "хобби") == []
+    assert found(db, "увлекаешься") == [answer_id]
+
+    # rank 1 compares the index with the answers_search content, not only
+    # with itself
+    execute(db, "INSERT INTO answers_fts (answers_fts, rank) VALUES ('integrity-check', 1)")
+
+    execute(db, "DELETE FROM answers WHERE answer_id = ?", (answer_id,))
+    assert found(db, "шахмат") == []
+    execute(db, "INSERT INTO answers_fts (answers_fts, rank) VALUES ('integrity-check', 1)")
@@ -0,0 +1,103 @@
+"""SpamDetector rules."""
+
+from bot.utils.spam import SpamDetector
+
+
+def detector(**kwargs) -> SpamDetector:
+    # Every rule but the one under test is out of reach
+    settings = dict(window=60, max_messages=1000, short_count=1000,
+                    repeat_count=10, repeat_limit=3, cooldown=600)
+    settings.update(kwargs)
+    return SpamDetector(**settings)
+
+
+def test_rate_limit():
+    spam = detector(max_messages=5)
+    results = [spam.check(1, f"message number {i}", now=i) for i in range(5)]
+    assert results == [None, None, None, None, "rate"]
+
+
+def test_rate_limit_spread_over_window_is_allowed():
+    spam = detector(max_messages=5)
+    assert all(spam.check(1, f"message number {i}", now=i * 20) is None for i in range(20))
+
+
+def test_short_messages():
+    spam = detector(short_count=4, short_ratio=0.75, short_length=5)
+    assert spam.check(1, "ok", now=0) is None
+    assert spam.check(1, "a long enough message", now=1) is None
+    assert spam.check(1, "ok", now=2) is None
+    assert spam.check(1, "ok", now=3) == "short"
+
+
+def test_repeats_are_normalized():
+    spam = detector()
+    assert spam.check(1, "Buy now", now=0) is None
+    assert spam.check(1, "buy   NOW", now=1) is None
+    assert spam.check(1, " buy now ", now=2) == "repeat"
+
+
+def test_repeat_window_uses_times_of_the_repeated_text():
+    # Three repeats within 60 seconds, after an unrelated message sent
+    # long before them: the old message must not hide the repeats
+    spam = detector()
+    assert spam.check(1, "hello everyone", now=0) is None
+    assert spam.check(1, "spam", now=100) is None
+    assert spam.check(1, "spam", now=110) is None
+    assert spam.check(1, "spam", now=120) == "repeat"
+
+
+def test_repeats_spread_over_more_than_window_are_allowed():
+    spam = detector()
+    assert spam.check(1, "spam", now=0) is None
+    assert spam.check(1, "other", now=1) is None
+    assert spam.check(1, "spam", now=50) is None
+    assert spam.check(1, "spam", now=100) is None
+    # The repeats at 50 and 100 plus this one fit in the window
+    assert spam.check(1, "spam", now=105) == "repeat"
+
+
+def test_repeats_leave_the_message_window():
+    spam = detector(repeat_count=4)
+    assert spam.check(1, "spam", now=0) is None
+    assert spam.check(1, "spam", now=1) is None
+    for i, text in enumerate(("one", "two", "three")):
+        assert spam.check(1, text, now=2 + i) is None
+    # The first two repeats are no longer among the last four messages
+    assert spam.check(1, "spam", now=5) is None
+
+
+def test_media_without_caption_counts_only_towards_rate():
+    spam = detector(max_messages=3, short_count=2, short_ratio=1.0)
+    assert spam.check(1, None, now=0) is None
+    assert spam.check(1, None, now=1) is None
+    assert spam.check(1, None, now=2) == "rate"
+
+
+def test_cooldown_after_hit():
+    spam = detector(cooldown=100)
+    for i in range(3):
+        result = spam.check(1, "spam", now=i)
+    assert result == "repeat"
+    assert all(spam.check(1, "spam", now=3 + i) is None for i in range(10))
+    for i in range(3):
+        result = spam.check(1, "spam", now=200 + i)
+    assert result == "repeat"
+
+
+def test_users_are_independent():
+    spam = detector()
+    assert spam.check(1, "spam", now=0) is None
+    assert spam.check(2, "spam", now=1) is None
+    assert spam.check(1, "spam", now=2) is None
+    assert spam.check(2, "spam", now=3) is None
+    assert spam.check(1, "spam", now=4) == "repeat"
+
+
+def test_idle_users_are_evicted():
+    spam = detector(idle_timeout=600)
+    spam.check(1, "hello", now=0)
+    spam.check(2, "hello", now=500)
+    assert len(spam) == 2
+    spam.check(3, "hello", now=700)
+    assert len(spam) == 2
@@ -0,0 +1,20 @@
+"""Trace records and their file."""
+
+import logging
+
+from bot.utils import tracing
+from config import Config
+
+
+def test_unwritable_trace_file_is_reported_once(tmp_path, monkeypatch, caplog):
+    blocker = tmp_path / "file"
+    blocker.write_text("")
+    monkeypatch.setattr(Config, "TRACE_FILE", str(blocker / "trace.jsonl"))
+    monkeypatch.setattr(tracing, "_trace_logger", None)
+    monkeypatch.setattr(tracing, "_trace_file_error", None)
+
+    with caplog.at_level(logging.ERROR, logger=tracing.__name__):
+        for _ in range(3):
+            tracing.write_record({"handler": "test"})
+    assert len(caplog.records) == 1
+    assert "trace records are dropped" in caplog.records[0].getMessage()
@@ -0,0 +1,39 @@
+"""Targets of operator commands."""
+
+import asyncio
+from datetime import datetime
+
+from aiogram.types import Chat, Message, User
+
+from bot.utils.users import resolve_target
+
+CHAT = Chat(id=-1001, type="supergroup")
+OPERATOR = User(id=1, is_bot=False, first_name="Operator")
+MEMBER = User(id=2, is_bot=False, first_name="Member", username="member")
+OUTSIDER = User(id=3, is_bot=False, first_name="Outsider", username="outsider")
+
+
+def command(text: str, reply: Message = None) -> Message:
+    return Message(message_id=10, date=datetime.now(), chat=CHAT, from_user=OPERATOR,
+                   text=text, reply_to_message=reply)
+
+
+def test_reply_targets_the_sender():
+    reply = Message(message_id=5, date=datetime.now(), chat=CHAT, from_user=MEMBER, text="spam")
+    assert asyncio.run(resolve_target(command("/warn flood", reply), "flood")) == (
+        2, "@member", "flood"
+    )
+
+
+def test_reply_to_a_forward_targets_who_forwarded_it():
+    forward = Message(message_id=5, date=datetime.now(), chat=CHAT, from_user=MEMBER,
+                      forward_from=OUTSIDER, text="spam")
+    user_id, label, _ = asyncio.run(resolve_target(command("/ban", forward)))
+    assert (user_id, label) == (2, "@member")
+
+
+def test_numeric_argument_wins_over_the_reply():
+    reply = Message(message_id=5, date=datetime.now(), chat=CHAT, from_user=MEMBER, text="spam")
+    assert asyncio.run(resolve_target(command("/warn 42 flood", reply), "42 flood")) == (
+        42, "42", "flood"
+    )